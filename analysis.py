@@ -0,0 +1,560 @@
+from __future__ import annotations
+
+import re
+from array import array
+from typing import Callable
+
+from cipher import LATIN, Alphabet, _byte_view, decrypt
+from crib import build_matcher, match_all, matching_shifts
+from ngrams import quadgram_fit, quadgram_floor, quadgram_score, quadgram_scores
+from perf import timed
+from resultcache import CachedResult, ResultCache
+from scoring import (
+    LANGUAGES,
+    Histogram,
+    alphabet_counts,
+    alphabet_scores,
+    chi_square_scores,
+    confidence_inplace,
+    confidence_percent,
+    language_scores,
+    letter_counts_az,
+    resolve_languages,
+)
+from segments import SegmentProfile, segment_profile
+from vigenere import crack, vigenere
+
+
+SCORERS = ("chi2", "quadgram")
+VIGENERE = "vigenere"
+DEFAULT_LANGUAGES = ("en",)
+
+# Progressive quadgram ranking first scores a sample of this many chars, taken
+# as evenly spaced slices; texts shorter than twice the sample are always
+# scored in full.
+_SAMPLE_CHARS = 1 << 14
+_SAMPLE_PIECES = 16
+# Candidate rows only show the start of each plaintext.
+PREVIEW_CHARS = 1 << 10
+# A shift survives the sample round if its score is within
+# max(absolute, relative * |kth|) of the k-th best sample score.
+_PRUNE_SLACK = (0.05, 40.0)
+
+
+_NON_SPACE = re.compile(rb"\S")
+
+
+def _as_payload(data):
+    # Other buffers (mmap, array, ...) are viewed as flat bytes without a copy.
+    return data if isinstance(data, (str, bytes, bytearray, memoryview)) else _byte_view(data, "text")
+
+
+def _is_blank(data) -> bool:
+    if isinstance(data, str):
+        return not data.strip()
+    return _NON_SPACE.search(data) is None
+
+
+def _as_str(data: str | bytes, errors: str = "surrogateescape") -> str:
+    # Byte payloads stay bytes through cipher and scoring; only crib matching
+    # and display need text. ASCII shifts commute with UTF-8 decoding.
+    return data if isinstance(data, str) else str(data, "utf-8", errors)
+
+
+def padded_quadgram_scores(plaintexts) -> list[float]:
+    # A shift of a mixed alphabet turns letters into symbols and back, so raw
+    # sums cover a different number of quadgrams per shift and the shift that
+    # keeps the fewest letters would win. Charge every quadgram a shift lost,
+    # relative to the one that kept the most, at the table's floor.
+    fits = list(map(quadgram_fit, plaintexts))
+    most = max((n for _, n in fits), default=0)
+    if not most:
+        return [float("inf")] * len(fits)
+    floor = quadgram_floor()
+    return [cost + (most - n) * floor for cost, n in fits]
+
+
+def shift_scores(text: str | bytes, alphabet: Alphabet = LATIN, scorer: str = "chi2") -> list[float]:
+    if scorer == "quadgram":
+        if alphabet is LATIN:
+            return quadgram_scores(text)
+        return padded_quadgram_scores(decrypt(text, k, alphabet) for k in range(alphabet.size))
+    if alphabet is LATIN:
+        counts, total = letter_counts_az(text)
+        return chi_square_scores(counts, total)
+    counts, _ = alphabet_counts(text, alphabet)
+    return alphabet_scores(counts, alphabet)
+
+
+def language_shift_scores(
+    text: str | bytes,
+    alphabet: Alphabet = LATIN,
+    languages=None,
+) -> tuple[list[float], list[str]]:
+    # Chi-square against every language at once; each shift keeps the language
+    # it fits best, so scores stay comparable across shifts.
+    codes = resolve_languages(languages)
+    if alphabet is LATIN:
+        counts, total = letter_counts_az(text)
+        table = language_scores(counts, total, codes)
+    else:
+        counts, _ = alphabet_counts(text, alphabet)
+        table = {code: alphabet_scores(counts, alphabet, LANGUAGES[code]) for code in codes}
+    scores = []
+    best = []
+    for shift in range(alphabet.size):
+        code = min(codes, key=lambda c: table[c][shift])
+        scores.append(table[code][shift])
+        best.append(code)
+    return scores, best
+
+
+def _strided_sample(text: str | bytes, chars: int, pieces: int = _SAMPLE_PIECES) -> str | bytes:
+    # Slices from across the whole text, so a prefix that reads differently
+    # from the rest cannot decide which shifts survive.
+    size = chars // pieces
+    stride = len(text) // pieces
+    parts = [text[i * stride:i * stride + size] for i in range(pieces)]
+    return "".join(parts) if isinstance(text, str) else b"".join(parts)
+
+
+def _quadgram_scores_for(text: str | bytes, shifts: list[int], alphabet: Alphabet) -> list[float]:
+    if alphabet is LATIN:
+        return quadgram_scores(text, shifts)
+    scores = [float("inf")] * alphabet.size
+    for k, score in zip(shifts, padded_quadgram_scores(decrypt(text, k, alphabet) for k in shifts)):
+        scores[k] = score
+    return scores
+
+
+def _survivors(
+    sample_scores: list[float],
+    k: int,
+    eligible: Callable[[int], bool] | None,
+) -> list[int]:
+    relative, absolute = _PRUNE_SLACK
+    bound = float("inf")
+    kept = []
+    for shift in sorted(range(len(sample_scores)), key=sample_scores.__getitem__):
+        score = sample_scores[shift]
+        if score > bound:
+            break
+        if eligible is not None and not eligible(shift):
+            continue
+        kept.append(shift)
+        if len(kept) == k:
+            bound = score + max(absolute, relative * abs(score))
+    return kept
+
+
+def top_k_shifts(
+    text: str | bytes,
+    k: int,
+    alphabet: Alphabet = LATIN,
+    scorer: str = "chi2",
+    eligible: Callable[[int], bool] | None = None,
+) -> list[tuple[int, float]]:
+    if k < 1:
+        raise ValueError("k must be at least 1")
+    # Chi-square ranks every shift from one histogram, so there is nothing to
+    # prune. Quadgram sums over an alphabet that mixes letters with other
+    # symbols cover a different number of letters per shift, so a sample
+    # cannot bound them either.
+    if scorer != "quadgram" or alphabet.mixes_letters or len(text) <= 2 * _SAMPLE_CHARS:
+        scores = shift_scores(text, alphabet, scorer)
+        kept = [s for s in range(alphabet.size) if eligible is None or eligible(s)]
+    else:
+        sample_scores = shift_scores(_strided_sample(text, _SAMPLE_CHARS), alphabet, scorer)
+        kept = _survivors(sample_scores, k, eligible)
+        scores = _quadgram_scores_for(text, kept, alphabet)
+    kept.sort(key=scores.__getitem__)
+    return [(s, scores[s]) for s in kept[:k]]
+
+
+def rank_candidates(
+    text: str | bytes,
+    matcher: Callable[[str], bool],
+    alphabet: Alphabet = LATIN,
+    scorer: str = "chi2",
+) -> list[tuple[int, float, str | None]]:
+    scores = shift_scores(text, alphabet, scorer)
+    items = []
+    for shift in range(alphabet.size):
+        plain = None
+        if matcher is not match_all:
+            plain = decrypt(text, shift, alphabet)
+            if not matcher(_as_str(plain)):
+                continue
+        items.append((shift, scores[shift], plain))
+    items.sort(key=lambda x: x[1])
+    return items
+
+
+def best_from_scores(scores, top: int = 10) -> tuple[int, float, float]:
+    order = sorted(range(len(scores)), key=scores.__getitem__)[:top]
+    confs = confidence_inplace(array("d", map(scores.__getitem__, order)))
+    return order[0], scores[order[0]], confs[0]
+
+
+def best_from_histogram(hist: Histogram, top: int = 10) -> tuple[int, float, float]:
+    return best_from_scores(hist.chi_square_scores(), top)
+
+
+def best_from_counts(
+    counts: list[int],
+    total: int,
+    top: int = 10,
+    alphabet: Alphabet = LATIN,
+) -> tuple[int, float, float]:
+    if alphabet is LATIN:
+        return best_from_histogram(Histogram(counts, total), top)
+    scores = alphabet_scores(counts, alphabet)
+    order = sorted(range(alphabet.size), key=scores.__getitem__)
+    confs = confidence_percent([scores[s] for s in order[:top]])
+    return order[0], scores[order[0]], confs[0]
+
+
+class AnalysisState:
+    def __init__(
+        self,
+        alphabet: Alphabet = LATIN,
+        scorer: str = "chi2",
+        plaintext_budget: int = 1 << 26,
+        cache: ResultCache | None = None,
+        languages=DEFAULT_LANGUAGES,
+    ):
+        if scorer not in SCORERS:
+            raise ValueError(f"unknown scorer: {scorer}")
+        self.alphabet = alphabet
+        self.scorer = scorer
+        self.plaintext_budget = plaintext_budget
+        self.cache = cache
+        self.languages = resolve_languages(languages)
+        self._text = None
+        self._reset()
+
+    def _reset(self):
+        self._counts = None
+        self._total = 0
+        self._scores = None
+        self._score_languages = None
+        self._plaintexts: dict[int, str] = {}
+        self._crib_key = None
+        self._crib_matches = None
+        self._crib_error = None
+        self._vigenere = None
+        self._vigenere_plain: dict[str, str] = {}
+        self._decoded = None
+        self._cache_key = None
+        self._profile = None
+
+    def set_text(self, text: str | bytes) -> None:
+        text = _as_payload(text)
+        if text is self._text or text == self._text:
+            return
+        self._text = text
+        self._reset()
+
+    def set_alphabet(self, alphabet: Alphabet) -> None:
+        if alphabet is self.alphabet:
+            return
+        self.alphabet = alphabet
+        self._reset()
+
+    def set_scorer(self, scorer: str) -> None:
+        if scorer not in SCORERS:
+            raise ValueError(f"unknown scorer: {scorer}")
+        if scorer != self.scorer:
+            self.scorer = scorer
+            self._scores = None
+            self._score_languages = None
+            self._cache_key = None
+
+    def set_languages(self, languages) -> None:
+        codes = resolve_languages(languages)
+        if codes != self.languages:
+            self.languages = codes
+            self._scores = None
+            self._score_languages = None
+            self._cache_key = None
+
+    def _multilingual(self) -> bool:
+        return self.scorer == "chi2" and self.languages != DEFAULT_LANGUAGES
+
+    def language(self, shift: int) -> str:
+        # Quadgrams only model English.
+        if self._score_languages is not None:
+            return self._score_languages[shift % self.alphabet.size]
+        return self.languages[0] if self._multilingual() else DEFAULT_LANGUAGES[0]
+
+    def _from_cache(self) -> None:
+        # Entries hold one score per shift, not which language won it, so only
+        # single-language rankings are cached.
+        if self.cache is None or self._cache_key is not None or len(self.languages) > 1:
+            return
+        scorer = f"{self.scorer}:{self.languages[0]}" if self._multilingual() else self.scorer
+        self._cache_key = self.cache.key(self._text, self.alphabet, scorer)
+        entry = self.cache.get(self._cache_key)
+        if entry is not None:
+            self._counts, self._total = entry.hist.tolist(), entry.hist.total
+            self._scores = entry.scores.tolist()
+
+    def histogram(self) -> tuple[list[int], int]:
+        if self._counts is None:
+            self._from_cache()
+        if self._counts is None:
+            self._counts, self._total = letter_counts_az(self._text)
+        return self._counts, self._total
+
+    def text(self) -> str:
+        if self._decoded is None:
+            self._decoded = _as_str(self._text)
+        return self._decoded
+
+    def segment_profile(self) -> SegmentProfile | None:
+        # Windows are scored against the first selected language; the profile is
+        # kept until the text, alphabet or that language changes.
+        if self.alphabet is not LATIN:
+            return None
+        language = self.languages[0]
+        if self._profile is None or self._profile[0] != language:
+            self._profile = (language, segment_profile(self._text, language=language))
+        return self._profile[1]
+
+    def rotated_histogram(self, shift: int) -> tuple[list[int], int]:
+        counts, total = self.histogram()
+        return [counts[(i + shift) % 26] for i in range(26)], total
+
+    def selected_histogram(self, shift: int, mode: str, key: str = "") -> tuple[list[int], int]:
+        if self.alphabet is LATIN and mode != VIGENERE:
+            return self.rotated_histogram(shift if mode == "decrypt" else -shift)
+        return letter_counts_az(self.output(shift, mode, key))
+
+    def scores(self) -> list[float]:
+        if self._scores is None:
+            self._from_cache()
+        if self._scores is None:
+            if self._multilingual():
+                self._scores, self._score_languages = language_shift_scores(
+                    self._text, self.alphabet, self.languages
+                )
+            elif self.scorer == "quadgram" and self.alphabet is not LATIN:
+                self._scores = padded_quadgram_scores(map(self.plaintext, range(self.alphabet.size)))
+            elif self.scorer == "chi2" and self.alphabet is LATIN:
+                counts, total = self.histogram()
+                self._scores = chi_square_scores(counts, total)
+            else:
+                self._scores = shift_scores(self._text, self.alphabet, self.scorer)
+            if self._cache_key is not None:
+                counts, total = self.histogram()
+                self.cache.put(self._cache_key, CachedResult(Histogram(counts, total), self._scores))
+        return self._scores
+
+    def plaintext(self, shift: int) -> str:
+        shift %= self.alphabet.size
+        plain = self._plaintexts.get(shift)
+        if plain is None:
+            plain = decrypt(self._text, shift, self.alphabet)
+            if len(self._text) * (len(self._plaintexts) + 1) <= self.plaintext_budget:
+                self._plaintexts[shift] = plain
+        return plain
+
+    def vigenere_plaintext(self, key: str) -> str:
+        plain = self._vigenere_plain.get(key)
+        if plain is None:
+            plain = vigenere(self._text, key, decrypt=True)
+            self._vigenere_plain[key] = plain
+        return plain
+
+    def output(self, shift: int, mode: str, key: str = "") -> str:
+        if mode == VIGENERE:
+            return self.vigenere_plaintext(key) if key.strip() else self._text
+        return self.plaintext(shift if mode == "decrypt" else -shift)
+
+    def vigenere_keys(self, limit: int = 1) -> list[tuple[str, float]]:
+        if self.alphabet is not LATIN:
+            return []
+        if self._vigenere is None:
+            self._vigenere = crack(self._text)
+        found = self._vigenere[:limit]
+        if self.scorer == "quadgram":
+            return [(key, quadgram_score(self.vigenere_plaintext(key))) for key, _ in found]
+        return found
+
+    def candidate_preview(self, candidate: int | str, chars: int = PREVIEW_CHARS) -> str:
+        head = self._text[:chars]
+        if isinstance(candidate, str):
+            plain = self._vigenere_plain.get(candidate)
+            plain = plain[:chars] if plain is not None else vigenere(head, candidate, decrypt=True)
+        else:
+            plain = self._plaintexts.get(candidate % self.alphabet.size)
+            plain = plain[:chars] if plain is not None else decrypt(head, candidate, self.alphabet)
+        return _as_str(plain, "backslashreplace")
+
+    def crib_matches(self, crib: tuple) -> tuple[list[bool] | None, str | None]:
+        if crib != self._crib_key:
+            hints, crib_mode, ignore_case, use_regex, word_boundary = crib
+            self._crib_key = crib
+            self._crib_error = None
+            if not use_regex:
+                self._crib_matches = matching_shifts(
+                    self.text(), list(hints), crib_mode, ignore_case, word_boundary, self.alphabet
+                )
+                if self._crib_matches is not None:
+                    return self._crib_matches, None
+
+            matcher, err = build_matcher(list(hints), crib_mode, ignore_case, use_regex, word_boundary)
+            self._crib_error = err
+            if err:
+                self._crib_matches = None
+            elif matcher is match_all:
+                self._crib_matches = [True] * self.alphabet.size
+            else:
+                self._crib_matches = [matcher(_as_str(self.plaintext(k))) for k in range(self.alphabet.size)]
+        return self._crib_matches, self._crib_error
+
+    def _crib_filter(self, crib: tuple) -> tuple[Callable[[int], bool] | None, str | None]:
+        hints, crib_mode, ignore_case, use_regex, word_boundary = crib
+        if crib == self._crib_key or not use_regex:
+            matches, err = self.crib_matches(crib)
+            return (None if err else matches.__getitem__), err
+        matcher, err = build_matcher(list(hints), crib_mode, ignore_case, use_regex, word_boundary)
+        if err or matcher is match_all:
+            return None, err
+        return (lambda k: matcher(_as_str(self.plaintext(k)))), None
+
+    def ranked(self, crib: tuple) -> tuple[list[tuple[int, float]], str | None]:
+        matches, err = self.crib_matches(crib)
+        if err:
+            return [], err
+        scores = self.scores()
+        items = [(k, scores[k]) for k in range(self.alphabet.size) if matches[k]]
+        items.sort(key=lambda x: x[1])
+        return items, None
+
+    def best(
+        self,
+        text: str | bytes,
+        crib: tuple,
+        top: int = 10,
+        alphabet: Alphabet | None = None,
+        scorer: str | None = None,
+        languages=None,
+    ) -> tuple[int, float, float] | None:
+        if alphabet is not None:
+            self.set_alphabet(alphabet)
+        if scorer is not None:
+            self.set_scorer(scorer)
+        if languages is not None:
+            self.set_languages(languages)
+        self.set_text(text)
+        items, err = self.ranked(crib)
+        if err or not items:
+            return None
+        confs = confidence_percent([s for _, s in items[:top]])
+        shift, score = items[0]
+        return shift, score, confs[0]
+
+    @timed("analysis.top_k")
+    def top_k(
+        self,
+        text: str | bytes,
+        crib: tuple,
+        k: int = 1,
+        alphabet: Alphabet | None = None,
+        scorer: str | None = None,
+        languages=None,
+    ) -> tuple[list[tuple[int, float]], str | None]:
+        if alphabet is not None:
+            self.set_alphabet(alphabet)
+        if scorer is not None:
+            self.set_scorer(scorer)
+        if languages is not None:
+            self.set_languages(languages)
+        self.set_text(text)
+        if self._scores is None:
+            self._from_cache()
+        if self._scores is None and self._multilingual():
+            # Progressive pruning bounds English scores only; rank every shift.
+            self.scores()
+        if self._scores is not None and (crib == self._crib_key or not crib[0]):
+            items, err = self.ranked(crib)
+            return items[:k], err
+        eligible, err = self._crib_filter(crib)
+        if err:
+            return [], err
+        return top_k_shifts(self._text, k, self.alphabet, self.scorer, eligible), None
+
+    @timed("analysis.analyze")
+    def analyze(
+        self,
+        text: str | bytes,
+        shift: int,
+        mode: str,
+        crib: tuple,
+        top: int = 10,
+        alphabet: Alphabet | None = None,
+        scorer: str | None = None,
+        key: str = "",
+        languages=None,
+        timeline: bool = False,
+    ) -> dict:
+        if alphabet is not None:
+            self.set_alphabet(alphabet)
+        if scorer is not None:
+            self.set_scorer(scorer)
+        if languages is not None:
+            self.set_languages(languages)
+        self.set_text(text)
+        empty = ([0] * 26, 0)
+        result = {
+            "output": "",
+            "candidates": [],
+            "languages": [],
+            "message": None,
+            "alpha_total": 0,
+            "input_hist": empty,
+            "selected_hist": empty,
+            "language": DEFAULT_LANGUAGES[0],
+            "profile": None,
+        }
+        if _is_blank(self._text):
+            return result
+
+        try:
+            out = self.output(shift, mode, key)
+            result["selected_hist"] = self.selected_histogram(shift, mode, key)
+        except Exception as e:
+            out = f"[Error] {e}"
+        result["output"] = _as_str(out, "backslashreplace")
+        result["input_hist"] = self.histogram()
+        if timeline:
+            result["profile"] = self.segment_profile()
+
+        items, err = self.ranked(crib)
+        if mode != VIGENERE:
+            # The language the selected shift reads best in, for the chart's reference.
+            result["language"] = self.language(shift if mode == "decrypt" else -shift)
+        if err:
+            result["message"] = err
+            return result
+        keys = self.vigenere_keys()
+        if keys and crib[0]:
+            matcher, _ = build_matcher(list(crib[0]), *crib[1:])
+            keys = [(k, s) for k, s in keys if matcher(_as_str(self.vigenere_plaintext(k)))]
+        items = sorted(items + keys, key=lambda x: x[1])
+        if not items:
+            result["message"] = "No candidates"
+            return result
+
+        shown = items[:top]
+        confs = confidence_percent([s for _, s in shown])
+        result["candidates"] = [
+            (candidate, score, conf, self.candidate_preview(candidate))
+            for (candidate, score), conf in zip(shown, confs)
+        ]
+        result["languages"] = [
+            DEFAULT_LANGUAGES[0] if isinstance(candidate, str) else self.language(candidate) for candidate, _ in shown
+        ]
+        _, result["alpha_total"] = self.histogram()
+        return result
@@ -0,0 +1,420 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import timeit
+
+import analysis
+import crib
+import ngrams
+import resultcache
+import scoring
+import segments
+import vigenere
+from cipher import caesar, decrypt, encrypt
+
+
+def _caesar_loop(text: str, shift: int) -> str:
+    s = shift % 26
+    out_chars: list[str] = []
+    for ch in text:
+        o = ord(ch)
+        if 65 <= o <= 90:
+            out_chars.append(chr((o - 65 + s) % 26 + 65))
+        elif 97 <= o <= 122:
+            out_chars.append(chr((o - 97 + s) % 26 + 97))
+        else:
+            out_chars.append(ch)
+    return "".join(out_chars)
+
+
+def make_ascii_text(size: int, seed: int = 1) -> str:
+    rng = random.Random(seed)
+    alphabet = "abcdefghijklmnopqrstuvwxyz      ABCDEFGHIJKLMNOPQRSTUVWXYZ.,\n0123456789"
+    return "".join(rng.choice(alphabet) for _ in range(size))
+
+
+def make_unicode_text(size: int, seed: int = 2) -> str:
+    rng = random.Random(seed)
+    alphabet = "abcdefghijklmnopqrstuvwxyz    ABCDEFG.,\néèüößçñ한국어日本語—…"
+    return "".join(rng.choice(alphabet) for _ in range(size))
+
+
+def _best_time(fn, *args, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _mbps(text: str, seconds: float) -> float:
+    return len(text.encode("utf-8")) / (1024 * 1024) / seconds if seconds > 0 else float("inf")
+
+
+def bench_caesar(size: int, repeat: int) -> None:
+    print(f"caesar throughput ({size} chars, best of {repeat})")
+    for label, text in (("ascii", make_ascii_text(size)), ("unicode", make_unicode_text(size))):
+        assert _caesar_loop(text, 7) == encrypt(text, 7)
+        assert decrypt(encrypt(text, 7), 7) == text
+        before = _best_time(_caesar_loop, text, 7, repeat=repeat)
+        after = _best_time(encrypt, text, 7, repeat=repeat)
+        print(
+            f"  {label:<8} loop {_mbps(text, before):9.1f} MB/s"
+            f" | table {_mbps(text, after):9.1f} MB/s"
+            f" | x{before / after:.1f}"
+        )
+
+    data = make_ascii_text(size).encode("ascii")
+    t = _best_time(encrypt, data, 7, repeat=repeat)
+    print(f"  {'bytes':<8} table {len(data) / (1024 * 1024) / t:9.1f} MB/s")
+
+
+def _parse_size(raw: str) -> int:
+    units = {"K": 1024, "M": 1024 * 1024, "G": 1024 * 1024 * 1024}
+    raw = raw.strip().upper().rstrip("B")
+    if raw and raw[-1] in units:
+        return int(float(raw[:-1]) * units[raw[-1]])
+    return int(raw)
+
+
+def _repeat_to(block: str, size: int) -> str:
+    reps, rest = divmod(size, len(block))
+    return block * reps + block[:rest]
+
+
+def bench_scoring(sizes: list[int], repeat: int) -> None:
+    print(f"letter_counts_az + chi_square_scores (best of {repeat})")
+    block = make_ascii_text(1024 * 1024)
+    backends = [("python", scoring._letter_counts_az_python, scoring._chi_square_scores_python)]
+    if scoring.np is not None:
+        backends.append(("numpy", scoring._letter_counts_az_numpy, scoring._chi_square_scores_numpy))
+    else:
+        print("  numpy not installed; only the python backend is measured")
+
+    for size in sizes:
+        text = _repeat_to(block, size)
+        cells = []
+        for label, count, score in backends:
+            def run():
+                counts, total = count(text)
+                return score(counts, total)
+
+            t = _best_time(run, repeat=repeat)
+            cells.append(f"{label} {t * 1000:10.2f} ms {_mbps(text, t):9.1f} MB/s")
+        print(f"  {size:>11} B | " + " | ".join(cells))
+
+
+def make_cribs(count: int, seed: int = 3) -> list[str]:
+    rng = random.Random(seed)
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(6, 10))) for _ in range(count)]
+
+
+def bench_crib(size: int, count: int, repeat: int) -> None:
+    print(f"crib matching: {count} cribs over {size} chars (best of {repeat})")
+    text = _repeat_to(make_ascii_text(min(size, 1024 * 1024)), size)
+    hints = make_cribs(count)
+    present = hints[:: max(1, count // 4)]
+
+    t = _best_time(crib.compile_automaton.__wrapped__, tuple(hints), repeat=repeat)
+    print(f"  automaton build {t * 1000:10.2f} ms")
+    automaton = crib.compile_automaton(tuple(hints))
+
+    for label, sample in (("no hit", text), ("hits at end", text + " " + " ".join(present))):
+        for mode in ("AND", "OR"):
+            naive = all if mode == "AND" else any
+            stop = automaton.full_mask if mode == "AND" else 0
+            t_naive = _best_time(lambda: naive(h in sample for h in hints), repeat=repeat)
+            t_auto = _best_time(automaton.scan, sample, stop, repeat=repeat)
+            print(
+                f"  {label:<12} {mode:<3} | substring loop {t_naive * 1000:10.2f} ms"
+                f" | automaton {t_auto * 1000:10.2f} ms"
+            )
+
+
+def _import_times(module: str) -> dict[str, int]:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        check=True,
+    )
+    cumulative: dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = [p.strip() for p in line[len("import time:"):].split("|")]
+        if parts[1].isdigit():
+            cumulative[parts[2].strip()] = int(parts[1])
+    return cumulative
+
+
+def bench_startup(modules: list[str], repeat: int) -> None:
+    print(f"import time (cumulative, best of {repeat}, fresh interpreter each run)")
+    for module in modules:
+        best: dict[str, int] | None = None
+        for _ in range(repeat):
+            times = _import_times(module)
+            if best is None or times.get(module, 0) < best.get(module, 0):
+                best = times
+        heavy = [m for m in ("customtkinter", "matplotlib", "numpy") if m in best]
+        print(f"  {module:<10} {best.get(module, 0) / 1000:9.1f} ms | loads: {', '.join(heavy) or '-'}")
+
+
+def bench_quadgram(sizes: list[int], repeat: int) -> None:
+    print(f"quadgram_scores, all 26 shifts (best of {repeat})")
+    t = _best_time(ngrams.quadgram_table, repeat=1)
+    print(f"  table load {t * 1000:10.2f} ms")
+    block = make_ascii_text(1024 * 1024)
+    numpy_mod = ngrams.np
+    for size in sizes:
+        text = encrypt(_repeat_to(block, size), 5)
+        cells = []
+        for label, backend in (("python", None), ("numpy", numpy_mod)):
+            if label == "numpy" and numpy_mod is None:
+                continue
+            ngrams.np = backend
+            try:
+                t = _best_time(ngrams.quadgram_scores, text, repeat=repeat)
+            finally:
+                ngrams.np = numpy_mod
+            cells.append(f"{label} {t * 1000:10.2f} ms")
+        print(f"  {size:>11} B | " + " | ".join(cells))
+
+
+def bench_topk(sizes: list[int], repeat: int) -> None:
+    print(f"recommend: full ranking vs progressive top-1 (best of {repeat})")
+    block = ngrams._default_corpus()
+    no_crib = ((), "OR", False, False, False)
+    for scorer in analysis.SCORERS:
+        for size in sizes:
+            text = encrypt(_repeat_to(block, size), 11)
+            full = analysis.AnalysisState(scorer=scorer).best(text, no_crib)
+            top, _ = analysis.AnalysisState(scorer=scorer).top_k(text, no_crib, k=1)
+            assert full[0] == top[0][0]
+            t_full = _best_time(lambda: analysis.AnalysisState(scorer=scorer).best(text, no_crib), repeat=repeat)
+            t_top = _best_time(lambda: analysis.AnalysisState(scorer=scorer).top_k(text, no_crib, k=1), repeat=repeat)
+            print(
+                f"  {scorer:<8} {size:>11} B | full {t_full * 1000:10.2f} ms"
+                f" | top-1 {t_top * 1000:10.2f} ms | x{t_full / t_top:.1f}"
+            )
+
+
+def make_messages(count: int, seed: int = 4) -> list[str]:
+    rng = random.Random(seed)
+    block = ngrams._default_corpus().replace("\n", " ")
+    out = []
+    for _ in range(count):
+        start = rng.randrange(len(block) - 160)
+        out.append(encrypt(block[start:start + rng.randint(20, 140)], rng.randrange(26)))
+    return out
+
+
+def _calibration():
+    # Fixed interpreter + memory workload used to normalise runs across machines.
+    data = bytes(range(256)) * 4096
+    table = bytes.maketrans(b"abc", b"bcd")
+    return lambda: (sum(range(200_000)), data.translate(table))
+
+
+def _measure(fn, calibration, rounds: int) -> dict:
+    # Every case sample is paired with a calibration sample taken just before
+    # it, so a machine that speeds up or slows down mid-run cancels out of the
+    # ratio. The spread of those ratios, without the two extremes, is kept as
+    # the case's noise.
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    cal_timer = timeit.Timer(calibration)
+    cal_number, _ = cal_timer.autorange()
+    seconds = []
+    ratios = []
+    for _ in range(rounds):
+        cal = cal_timer.timeit(cal_number) / cal_number
+        t = timer.timeit(number) / number
+        seconds.append(t)
+        ratios.append(t / cal)
+    relative = statistics.median(ratios)
+    inner = sorted(ratios)[1:-1] if rounds > 3 else ratios
+    return {"seconds": min(seconds), "relative": relative, "noise": (inner[-1] - inner[0]) / relative}
+
+
+def regression_cases(large: bool) -> list[tuple[str, object, int]]:
+    english = ngrams._default_corpus()
+    short = make_messages(1000)
+    one_mb = encrypt(_repeat_to(english, 1 << 20), 7)
+    unicode_mb = make_unicode_text(1 << 20)
+    hints_1000 = tuple(make_cribs(1000))
+    matchers = {
+        "or-1000": crib.build_matcher(list(hints_1000), "OR", False, False, False)[0],
+        "and-8-icase": crib.build_matcher(list(hints_1000[:8]), "AND", True, False, False)[0],
+        "regex-words": crib.build_matcher([r"\bth[a-z]+\b", r"ing\b"], "OR", False, True, True)[0],
+    }
+    scores = scoring.chi_square_scores(*scoring.letter_counts_az(one_mb))
+    plain = decrypt(one_mb, 7)
+    vig_mb = vigenere.vigenere(plain, "LEMONADE")
+    no_crib = ((), "AND", False, False, False)
+    warm = resultcache.ResultCache()
+    analysis.AnalysisState(scorer="quadgram", cache=warm).best(one_mb, no_crib)
+
+    def rank(text, matcher=crib.match_all, scorer="chi2"):
+        return lambda: analysis.rank_candidates(text, matcher, scorer=scorer)
+
+    cases = [
+        ("caesar/short-1000", lambda: [caesar(m, 3) for m in short], sum(map(len, short))),
+        ("caesar/ascii-1M", lambda: caesar(one_mb, 3), len(one_mb)),
+        ("caesar/unicode-1M", lambda: caesar(unicode_mb, 3), len(unicode_mb.encode("utf-8"))),
+        ("letter_counts_az/short-1000", lambda: [scoring.letter_counts_az(m) for m in short], sum(map(len, short))),
+        ("letter_counts_az/ascii-1M", lambda: scoring.letter_counts_az(one_mb), len(one_mb)),
+        ("letter_counts_az/unicode-1M", lambda: scoring.letter_counts_az(unicode_mb), len(unicode_mb.encode("utf-8"))),
+        ("chi_square_score/short-1000", lambda: [scoring.chi_square_score(m) for m in short], sum(map(len, short))),
+        ("chi_square_score/ascii-1M", lambda: scoring.chi_square_score(one_mb), len(one_mb)),
+        ("confidence_percent/26", lambda: scoring.confidence_percent(scores), 0),
+        ("language_scores/all-languages",
+         lambda: scoring.language_scores(*scoring.letter_counts_az(short[0])), 0),
+        ("segment_profile/ascii-1M", lambda: segments.segment_profile(one_mb), len(one_mb)),
+        ("best_from_histogram/short-1000",
+         lambda: [analysis.best_from_histogram(scoring.Histogram.from_text(m)) for m in short],
+         sum(map(len, short))),
+        ("build_matcher/or-1000-cold",
+         lambda: (crib.compile_automaton.cache_clear(),
+                  crib._build_matcher_cached.__wrapped__(hints_1000, "OR", False, False, False),
+                  crib.compile_automaton(hints_1000)),
+         0),
+    ]
+    cases += [(f"matcher/{name}/ascii-1M", (lambda m=m: m(plain)), len(plain)) for name, m in matchers.items()]
+    cases += [
+        ("build_candidates/chi2-1M", rank(one_mb), len(one_mb)),
+        ("build_candidates/crib-or-1000-1M", rank(one_mb, matchers["or-1000"]), len(one_mb)),
+        ("build_candidates/quadgram-100K", rank(one_mb[:100_000], scorer="quadgram"), 100_000),
+        ("build_candidates/short-1000", lambda: [analysis.rank_candidates(m, crib.match_all) for m in short],
+         sum(map(len, short))),
+        ("analyze/fresh-state-1M",
+         lambda: analysis.AnalysisState().analyze(one_mb, 3, "decrypt", ((), "AND", False, False, False)),
+         len(one_mb)),
+        ("best/quadgram-1M-cached",
+         lambda: analysis.AnalysisState(scorer="quadgram", cache=warm).best(one_mb, no_crib), len(one_mb)),
+        ("top_k/quadgram-1M",
+         lambda: analysis.top_k_shifts(one_mb, 1, scorer="quadgram"), len(one_mb)),
+        ("vigenere/crack-1M", lambda: vigenere.crack(vig_mb), len(vig_mb)),
+    ]
+    if large:
+        hundred_mb = _repeat_to(one_mb, 100 << 20)
+        cases += [
+            ("caesar/ascii-100M", lambda: caesar(hundred_mb, 3), len(hundred_mb)),
+            ("letter_counts_az/ascii-100M", lambda: scoring.letter_counts_az(hundred_mb), len(hundred_mb)),
+            ("build_candidates/chi2-100M", rank(hundred_mb), len(hundred_mb)),
+        ]
+    return cases
+
+
+def run_regression(large: bool, rounds: int, only: str | None = None) -> dict:
+    ngrams.quadgram_table()
+    calibration = _calibration()
+    results = {}
+    for name, fn, nbytes in regression_cases(large):
+        if only and only not in name:
+            continue
+        result = _measure(fn, calibration, rounds)
+        if nbytes:
+            result["mb_per_s"] = nbytes / (1024 * 1024) / result["seconds"]
+        results[name] = result
+        print(f"  {name:<40} {result['seconds'] * 1000:12.3f} ms  +-{result['noise'] * 50:4.1f}%")
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": scoring.np is not None,
+        "results": results,
+    }
+
+
+def compare_to_baseline(report: dict, baseline: dict, threshold: float) -> list[str]:
+    if baseline.get("numpy") != report["numpy"]:
+        print(f"baseline numpy={baseline.get('numpy')} but this run numpy={report['numpy']}; not compared")
+        return []
+    print(f"compared with baseline (threshold x{threshold:.2f} plus each case's noise)")
+    failures = []
+    for name, now in report["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if before is None or "relative" not in before:
+            print(f"  {name:<40} new")
+            continue
+        ratio = now["relative"] / before["relative"]
+        limit = threshold + now["noise"] + before["noise"]
+        flag = "SLOWER" if ratio > limit else "ok"
+        print(f"  {name:<40} x{ratio:6.2f} (limit x{limit:.2f}) {flag}")
+        if ratio > limit:
+            failures.append(name)
+    return failures
+
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json")
+SUITES = ("caesar", "scoring", "crib", "startup", "quadgram", "topk", "regress")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="ShiftSleuth micro-benchmarks")
+    parser.add_argument("suites", nargs="*", choices=SUITES, default=[s for s in SUITES if s != "regress"])
+    parser.add_argument("--size", type=int, default=2_000_000)
+    parser.add_argument("--scoring-sizes", default="1K,1M,100M")
+    parser.add_argument("--quadgram-sizes", default="1K,10K,100K")
+    parser.add_argument("--topk-sizes", default="100K,10M")
+    parser.add_argument("--crib-count", type=int, default=1000)
+    parser.add_argument("--crib-size", default="1M")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--rounds", type=int, default=7, help="regress: paired samples per case (default: 7)")
+    parser.add_argument("--large", action="store_true", help="regress: include the 100 MB corpora")
+    parser.add_argument("--only", help="regress: only run cases whose name contains this")
+    parser.add_argument("--json", help="regress: write the results to this file (use it to store a baseline)")
+    parser.add_argument(
+        "--baseline",
+        default=BASELINE if os.path.exists(BASELINE) else None,
+        help="regress: compare against a stored results file (default: bench_baseline.json)",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.3,
+        help="regress: fail when a case is this many times slower than the baseline (default: 1.3)",
+    )
+    args = parser.parse_args(argv)
+
+    if "caesar" in args.suites:
+        bench_caesar(args.size, args.repeat)
+    if "scoring" in args.suites:
+        bench_scoring([_parse_size(x) for x in args.scoring_sizes.split(",")], args.repeat)
+    if "crib" in args.suites:
+        bench_crib(_parse_size(args.crib_size), args.crib_count, args.repeat)
+    if "quadgram" in args.suites:
+        bench_quadgram([_parse_size(x) for x in args.quadgram_sizes.split(",")], args.repeat)
+    if "topk" in args.suites:
+        bench_topk([_parse_size(x) for x in args.topk_sizes.split(",")], args.repeat)
+    if "startup" in args.suites:
+        bench_startup(["cipher", "scoring", "crib", "analysis", "cli", "viz", "ui"], args.repeat)
+    if "regress" in args.suites:
+        print(f"regression cases (per call, best of {args.rounds})")
+        report = run_regression(args.large, args.rounds, args.only)
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+        if args.baseline:
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)
+            failures = compare_to_baseline(report, baseline, args.threshold)
+            if failures:
+                print(f"{len(failures)} case(s) regressed: {', '.join(failures)}", file=sys.stderr)
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,45 +1,226 @@
 from __future__ import annotations
 
+from typing import BinaryIO
 
-def _shift_upper(ch: str, shift: int) -> str:
-    base = ord("A")
-    return chr((ord(ch) - base + shift) % 26 + base)
+from perf import timed
 
+_UPPER = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+_LOWER = "abcdefghijklmnopqrstuvwxyz"
 
-def _shift_lower(ch: str, shift: int) -> str:
-    base = ord("a")
-    return chr((ord(ch) - base + shift) % 26 + base)
 
+def _is_word(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
 
-def caesar(text: str, shift: int, *, decrypt: bool = False) -> str:
-    if not isinstance(text, str):
-        raise TypeError("text must be a string")
+
+def _letter_index(ch: str) -> int:
+    i = _UPPER.find(ch)
+    return i if i >= 0 else _LOWER.find(ch)
+
+
+class Alphabet:
+    def __init__(self, name: str, *segments: str):
+        if not segments or not segments[0]:
+            raise ValueError("alphabet needs at least one non-empty segment")
+        size = len(segments[0])
+        if any(len(seg) != size for seg in segments):
+            raise ValueError("alphabet segments must have the same length")
+        chars = "".join(segments)
+        if len(set(chars)) != len(chars):
+            raise ValueError("alphabet characters must be unique")
+
+        self.name = name
+        self.segments = segments
+        self.size = size
+        self.chars = chars
+        self.is_ascii = chars.isascii()
+        self._tables: list[bytes | dict[int, int] | None] = [None] * size
+
+        fixed = "".join(ch for ch in _UPPER + _LOWER if ch not in chars)
+        self.members = chars + fixed
+        self.member_codes = [ord(ch) for ch in self.members]
+        self.member_bytes = [ch.encode("ascii") for ch in self.members] if self.is_ascii else None
+        self.letter_slots = [
+            (j, p, _letter_index(ch), ch in _UPPER)
+            for j, seg in enumerate(segments)
+            for p, ch in enumerate(seg)
+            if _letter_index(ch) >= 0
+        ]
+        self.mixes_case = any(
+            any(ch in _UPPER for ch in seg) and any(ch in _LOWER for ch in seg) for seg in segments
+        )
+        self.mixes_letters = any(
+            any(_letter_index(ch) >= 0 for ch in seg) and any(_letter_index(ch) < 0 for ch in seg) for seg in segments
+        )
+        self.fixed_slots = [(len(chars) + i, _letter_index(ch)) for i, ch in enumerate(fixed)]
+        self.preserves_word_class = all(
+            all(_is_word(ch) for ch in seg) or not any(_is_word(ch) for ch in seg) for seg in segments
+        )
+        probe = chars + chars.upper()
+        self.case_symmetric = self.translate(probe.lower(), 1) == self.translate(probe, 1).lower()
+
+    def __repr__(self) -> str:
+        return f"Alphabet({self.name!r}, size={self.size})"
+
+    def table(self, shift: int) -> bytes | dict[int, int]:
+        s = shift % self.size
+        table = self._tables[s]
+        if table is None:
+            shifted = "".join(seg[s:] + seg[:s] for seg in self.segments)
+            if self.is_ascii:
+                table = bytes.maketrans(self.chars.encode("ascii"), shifted.encode("ascii"))
+            else:
+                table = str.maketrans(self.chars, shifted)
+            self._tables[s] = table
+        return table
+
+    def translate(self, text: str | bytes | bytearray, shift: int) -> str | bytes | bytearray:
+        table = self.table(shift)
+        if not self.is_ascii:
+            if not isinstance(text, str):
+                raise TypeError("bytes input needs an ASCII alphabet")
+            return text.translate(table)
+        if not isinstance(text, str):
+            return text.translate(table)
+        if text.isascii():
+            return text.encode("ascii").translate(table).decode("ascii")
+        raw = text.encode("utf-8", "surrogatepass")
+        return raw.translate(table).decode("utf-8", "surrogatepass")
+
+
+LATIN = Alphabet("A-Z", _UPPER, _LOWER)
+ROT47 = Alphabet("ROT47", "".join(chr(c) for c in range(33, 127)))
+ROT5 = Alphabet("ROT5", "0123456789")
+ALNUM = Alphabet("ALNUM", "0123456789" + _UPPER + _LOWER)
+
+ALPHABETS = {a.name: a for a in (LATIN, ROT47, ROT5, ALNUM)}
+
+
+def _byte_view(buffer, name: str) -> memoryview:
+    try:
+        view = memoryview(buffer)
+    except TypeError:
+        raise TypeError(f"{name} must be a bytes-like object") from None
+    return view if view.format == "B" and view.ndim == 1 else view.cast("B")
+
+
+def caesar_into(
+    src,
+    dst,
+    shift: int,
+    *,
+    decrypt: bool = False,
+    alphabet: Alphabet = LATIN,
+    chunk_size: int = 1 << 16,
+) -> int:
+    # Translates any C-contiguous buffer (bytes, bytearray, mmap, memoryview)
+    # into a writable one without copying the source; dst may be src itself.
+    # Only bytes in the alphabet change, so the rest of a binary payload survives.
+    if not alphabet.is_ascii:
+        raise TypeError("bytes input needs an ASCII alphabet")
+    if not isinstance(shift, int):
+        raise TypeError("shift must be an int")
+    src_view = _byte_view(src, "src")
+    dst_view = _byte_view(dst, "dst")
+    if dst_view.readonly:
+        raise TypeError("dst must be a writable buffer")
+    n = len(src_view)
+    if len(dst_view) < n:
+        raise ValueError("dst is smaller than src")
+
+    # translate() over cache-sized chunks beats a numpy lookup table here.
+    table = alphabet.table(-shift if decrypt else shift)
+    for start in range(0, n, chunk_size):
+        end = min(start + chunk_size, n)
+        dst_view[start:end] = src_view[start:end].tobytes().translate(table)
+    return n
+
+
+@timed("cipher.caesar")
+def caesar(
+    text,
+    shift: int,
+    *,
+    decrypt: bool = False,
+    alphabet: Alphabet = LATIN,
+) -> str | bytes | bytearray:
+    if not isinstance(text, (str, bytes, bytearray)):
+        # Any other buffer (memoryview, mmap, array) is read in place.
+        try:
+            view = _byte_view(text, "text")
+        except TypeError:
+            raise TypeError("text must be a string or bytes-like object") from None
+        out = bytearray(len(view))
+        caesar_into(view, out, shift, decrypt=decrypt, alphabet=alphabet)
+        return out
     if not isinstance(shift, int):
         raise TypeError("shift must be an int")
 
-    s = shift % 26
+    s = shift % alphabet.size
     if decrypt:
-        s = (-s) % 26
+        s = (-s) % alphabet.size
+
+    return alphabet.translate(text, s)
+
+
+def encrypt(text: str, shift: int, alphabet: Alphabet = LATIN) -> str:
+    return caesar(text, shift, decrypt=False, alphabet=alphabet)
+
 
-    out_chars: list[str] = []
-    for ch in text:
-        o = ord(ch)
-        if 65 <= o <= 90:
-            out_chars.append(_shift_upper(ch, s))
-        elif 97 <= o <= 122:
-            out_chars.append(_shift_lower(ch, s))
-        else:
-            out_chars.append(ch)
+def decrypt(text: str, shift: int, alphabet: Alphabet = LATIN) -> str:
+    return caesar(text, shift, decrypt=True, alphabet=alphabet)
 
-    return "".join(out_chars)
 
+def caesar_stream(
+    src: BinaryIO,
+    dst: BinaryIO,
+    shift: int,
+    *,
+    decrypt: bool = False,
+    alphabet: Alphabet = LATIN,
+    chunk_size: int = 1 << 20,
+) -> int:
+    written = 0
+    if not hasattr(src, "readinto") or not alphabet.is_ascii:
+        while True:
+            chunk = src.read(chunk_size)
+            if not chunk:
+                return written
+            written += dst.write(caesar(chunk, shift, decrypt=decrypt, alphabet=alphabet))
 
-def encrypt(text: str, shift: int) -> str:
-    return caesar(text, shift, decrypt=False)
+    # Read into one reusable buffer and translate it in place.
+    with memoryview(bytearray(chunk_size)) as view:
+        while True:
+            n = src.readinto(view)
+            if not n:
+                return written
+            with view[:n] as chunk:
+                caesar_into(chunk, chunk, shift, decrypt=decrypt, alphabet=alphabet)
+                written += dst.write(chunk)
 
 
-def decrypt(text: str, shift: int) -> str:
-    return caesar(text, shift, decrypt=True)
+def decrypt_file(
+    src_path: str,
+    dst_path: str,
+    shift: int,
+    *,
+    alphabet: Alphabet = LATIN,
+    chunk_size: int = 1 << 20,
+) -> int:
+    with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+        return caesar_stream(src, dst, shift, decrypt=True, alphabet=alphabet, chunk_size=chunk_size)
 
 
-__all__ = ["caesar", "encrypt", "decrypt"]
+__all__ = [
+    "Alphabet",
+    "ALPHABETS",
+    "LATIN",
+    "ROT47",
+    "ROT5",
+    "ALNUM",
+    "caesar",
+    "caesar_into",
+    "encrypt",
+    "decrypt",
+    "caesar_stream",
+    "decrypt_file",
+]
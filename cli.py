@@ -0,0 +1,230 @@
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator
+
+from analysis import DEFAULT_LANGUAGES, SCORERS, AnalysisState, best_from_counts, best_from_scores
+from cipher import ALPHABETS, LATIN, decrypt, decrypt_file
+from crib import parse_hints
+from resultcache import CACHE_ENV, CachedResult, default_cache
+from scoring import LANGUAGES, Histogram, letter_counts_file
+
+
+def _result(source: str, shift: int, score: float, conf: float) -> dict:
+    return {
+        "source": source,
+        "shift": shift,
+        "score": round(score, 4) if math.isfinite(score) else None,
+        "confidence": round(conf, 2),
+    }
+
+
+def _crack_file(path: str, output_dir: str | None, alphabet) -> dict:
+    try:
+        counts, total = letter_counts_file(path, alphabet=None if alphabet is LATIN else alphabet)
+    except OSError as e:
+        return {"source": path, "error": str(e)}
+
+    shift, score, conf = best_from_counts(counts, total, alphabet=alphabet)
+    result = _result(path, shift, score, conf)
+    if output_dir:
+        out_path = os.path.join(output_dir, os.path.basename(path) + ".dec")
+        decrypt_file(path, out_path, shift, alphabet=alphabet)
+        result["output"] = out_path
+    return result
+
+
+def _crack(job: tuple[str, str | None, dict]) -> dict:
+    source, text, opts = job
+    if isinstance(text, OSError):
+        return {"source": source, "error": str(text)}
+    alphabet = ALPHABETS[opts["alphabet"]]
+    if text is None:
+        return _crack_file(source, opts["output_dir"], alphabet)
+    plain_ranking = (
+        not opts["hints"] and not opts["vigenere"] and not opts["segments"] and opts["languages"] == DEFAULT_LANGUAGES
+    )
+    if alphabet is LATIN and opts["scorer"] == "chi2" and plain_ranking:
+        # Plain chi-square ranking only needs the histogram; skip the per-job state.
+        cache = default_cache()
+        key = cache.key(text, alphabet, "chi2")
+        entry = cache.get(key)
+        if entry is None:
+            hist = Histogram.from_text(text)
+            entry = CachedResult(hist, hist.chi_square_scores())
+            cache.put(key, entry)
+        shift, score, conf = best_from_scores(entry.scores)
+        result = _result(source, shift, score, conf)
+        if opts["plaintext"]:
+            result["plaintext"] = decrypt(text, shift, alphabet)
+        return result
+
+    state = AnalysisState(alphabet, opts["scorer"], cache=default_cache(), languages=opts["languages"])
+    crib = (opts["hints"], opts["mode"], opts["ignore_case"], opts["use_regex"], opts["word_boundary"])
+    best = state.best(text, crib)
+    _, err = state.crib_matches(crib)
+    if err:
+        return {"source": source, "error": err}
+    if best is None:
+        return {"source": source, "shift": None, "score": None, "confidence": 0.0}
+
+    shift, score, conf = best
+    result = _result(source, shift, score, conf)
+    if opts["languages"] != DEFAULT_LANGUAGES:
+        result["language"] = state.language(shift)
+    if opts["plaintext"]:
+        result["plaintext"] = decrypt(text, shift, alphabet)
+    profile = state.segment_profile() if opts["segments"] else None
+    if profile is not None:
+        result["segments"] = [{"start": seg.start, "end": seg.end, "shift": seg.shift} for seg in profile.segments]
+    if opts["vigenere"]:
+        for key, key_score in state.vigenere_keys():
+            result["vigenere"] = {"key": key, "score": round(key_score, 4)}
+            if opts["plaintext"]:
+                result["vigenere"]["plaintext"] = state.vigenere_plaintext(key)
+    return result
+
+
+def _iter_inputs(paths: list[str], per_line: bool) -> Iterator[tuple[str, str | OSError]]:
+    # An unreadable file is passed on as its error so it gets a result line
+    # instead of ending the run.
+    for path in paths or ["-"]:
+        if path == "-":
+            name = "<stdin>"
+            for i, line in enumerate(sys.stdin, 1):
+                line = line.rstrip("\r\n")
+                if line:
+                    yield f"{name}:{i}", line
+            continue
+
+        try:
+            with open(path, encoding="utf-8", errors="surrogateescape") as f:
+                if not per_line:
+                    text = f.read()
+                else:
+                    for i, line in enumerate(f, 1):
+                        line = line.rstrip("\r\n")
+                        if line:
+                            yield f"{path}:{i}", line
+                    continue
+        except OSError as e:
+            yield path, e
+            continue
+        yield path, text
+
+
+def _ordered_map(executor: ProcessPoolExecutor, fn, jobs: Iterable, window: int) -> Iterator:
+    pending = deque()
+    for job in jobs:
+        pending.append(executor.submit(fn, job))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def crack_all(jobs: Iterable, workers: int) -> Iterator[dict]:
+    if workers <= 1:
+        yield from map(_crack, jobs)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from _ordered_map(executor, _crack, jobs, workers * 4)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Crack Caesar/ROT ciphertexts and emit JSON lines.")
+    parser.add_argument("inputs", nargs="*", help="files to read ('-' or nothing for stdin, one ciphertext per line)")
+    parser.add_argument("--lines", action="store_true", help="treat every line of an input file as its own ciphertext")
+    parser.add_argument("--alphabet", choices=list(ALPHABETS), default=LATIN.name, help="shift alphabet (default: A-Z)")
+    parser.add_argument("--scorer", choices=SCORERS, default="chi2", help="ranking score (default: chi2)")
+    parser.add_argument(
+        "--language",
+        choices=[*LANGUAGES, "auto"],
+        default=DEFAULT_LANGUAGES[0],
+        help="plaintext language for chi2; auto scores every language and reports the best fit (default: en)",
+    )
+    parser.add_argument("-j", "--workers", type=int, default=1, help="worker processes (default: 1)")
+    parser.add_argument("--crib", default="", help="comma separated crib hints")
+    parser.add_argument("--crib-mode", choices=["AND", "OR"], default="AND")
+    parser.add_argument("--ignore-case", action="store_true")
+    parser.add_argument("--regex", action="store_true")
+    parser.add_argument("--word-boundary", action="store_true")
+    parser.add_argument("--plaintext", action="store_true", help="include the decrypted text in each result")
+    parser.add_argument(
+        "--vigenere",
+        action="store_true",
+        help="also look for a repeating (Vigenere) key and report it when it reads better than any single shift",
+    )
+    parser.add_argument(
+        "--segments",
+        action="store_true",
+        help="also report the spans of each input that read best under different shifts (A-Z only)",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="score input files in fixed-size chunks without loading them into memory",
+    )
+    parser.add_argument("--output-dir", help="with --stream, write each file decrypted with its best shift here")
+    parser.add_argument(
+        "--cache",
+        metavar="PATH",
+        help=f"keep ranking results in this SQLite file across runs (default: ${CACHE_ENV}, else memory only)",
+    )
+    args = parser.parse_args(argv)
+    if args.cache:
+        # Set before any worker starts so every process opens the same file.
+        os.environ[CACHE_ENV] = args.cache
+
+    opts = {
+        "hints": tuple(parse_hints(args.crib)),
+        "mode": args.crib_mode,
+        "ignore_case": args.ignore_case,
+        "use_regex": args.regex,
+        "word_boundary": args.word_boundary,
+        "plaintext": args.plaintext,
+        "output_dir": args.output_dir,
+        "alphabet": args.alphabet,
+        "scorer": args.scorer,
+        "vigenere": args.vigenere,
+        "segments": args.segments,
+        "languages": tuple(LANGUAGES) if args.language == "auto" else (args.language,),
+    }
+    workers = args.workers
+
+    if args.stream:
+        if not args.inputs or "-" in args.inputs:
+            parser.error("--stream needs input file paths")
+        if opts["hints"] or args.plaintext or args.lines:
+            parser.error("--stream cannot be combined with --crib, --plaintext or --lines")
+        if args.scorer != "chi2":
+            parser.error("--stream only supports the chi2 scorer")
+        if args.vigenere or args.segments:
+            parser.error("--stream cannot be combined with --vigenere or --segments")
+        if opts["languages"] != DEFAULT_LANGUAGES:
+            parser.error("--stream only supports --language en")
+        if args.output_dir:
+            os.makedirs(args.output_dir, exist_ok=True)
+        jobs = ((path, None, opts) for path in args.inputs)
+    elif args.output_dir:
+        parser.error("--output-dir requires --stream")
+    else:
+        jobs = ((source, text, opts) for source, text in _iter_inputs(args.inputs, args.lines))
+
+    out = sys.stdout
+    for result in crack_all(jobs, workers):
+        # Undecodable input bytes survive as lone surrogates, which only an
+        # escaped dump can carry as valid UTF-8.
+        out.write(json.dumps(result) + "\n")
+        out.flush()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,23 @@
 from __future__ import annotations
 
 import re
+from functools import lru_cache
 from typing import Callable
 
+from cipher import LATIN, Alphabet, _is_word, encrypt
+from perf import timed
+
+
+_AUTOMATON_MIN_HINTS = 128
+# str.find runs at C speed, roughly this many times faster per character than
+# the automaton's Python loop, so substring scans go first and the automaton
+# only takes over once they have covered the text this many times.
+_SCAN_BUDGET = 16
+# The only characters outside ASCII whose lower() contains an ASCII letter:
+# KELVIN SIGN and LATIN CAPITAL LETTER I WITH DOT ABOVE.
+_FOLDS_TO_ASCII = ("\u212a", "\u0130")
+_MATCHER_CACHE_SIZE = 64
+
 
 def parse_hints(raw: str) -> list[str]:
     if not raw:
@@ -20,17 +35,203 @@ def parse_hints(raw: str) -> list[str]:
     return out
 
 
+class _Automaton:
+    def __init__(self, patterns: tuple[str, ...]):
+        self.size = len(patterns)
+        self.full_mask = (1 << self.size) - 1
+        goto: list[dict[str, int]] = [{}]
+        out = [0]
+        for i, p in enumerate(patterns):
+            state = 0
+            for ch in p:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    out.append(0)
+                state = nxt
+            out[state] |= 1 << i
+
+        fail = [0] * len(goto)
+        delta: list[dict[str, int]] = [dict(goto[0])] + [{} for _ in range(len(goto) - 1)]
+        queue = list(goto[0].values())
+        for state in queue:
+            delta[state] = dict(delta[fail[state]])
+            out[state] |= out[fail[state]]
+            for ch, nxt in goto[state].items():
+                fail[nxt] = delta[fail[state]].get(ch, 0)
+                delta[state][ch] = nxt
+                queue.append(nxt)
+
+        self._delta = delta
+        self._out = out
+
+    def scan(self, text: str, stop_mask: int) -> int:
+        delta = self._delta
+        out = self._out
+        found = 0
+        state = 0
+        for ch in text:
+            state = delta[state].get(ch, 0)
+            hit = out[state]
+            if hit:
+                found |= hit
+                if found & stop_mask == stop_mask:
+                    break
+        return found
+
+
+@lru_cache(maxsize=32)
+def compile_automaton(hints: tuple[str, ...]) -> _Automaton:
+    return _Automaton(hints)
+
+
+def _match_groups(text: str, groups: list[tuple[str, ...]], need_all: bool, automaton) -> list[bool]:
+    # Whether each group of equally many patterns has all (AND) or any (OR) of
+    # them in text. automaton() builds one over the patterns of every group in
+    # order; it is only asked for when the scan budget runs out.
+    n = len(text)
+    # Deciding a group usually costs one full scan, so each group adds one.
+    budget = n * (_SCAN_BUDGET + len(groups))
+    out: list[bool] = []
+    for group in groups:
+        decided = None
+        for p in group:
+            pos = text.find(p)
+            budget -= n if pos < 0 else pos + len(p)
+            if (pos >= 0) != need_all:
+                decided = not need_all
+                break
+            if budget < 0:
+                break
+        else:
+            decided = need_all
+        if decided is None:
+            break
+        out.append(decided)
+    if len(out) == len(groups):
+        return out
+
+    width = len(groups[0])
+    first = len(out)
+    rest = ((1 << (width * (len(groups) - first))) - 1) << (width * first)
+    # Stop at the first hit when a single OR group is left; otherwise only
+    # once every remaining pattern was seen.
+    stop = 0 if not need_all and first == len(groups) - 1 else rest
+    found = automaton().scan(text, stop)
+    group_mask = (1 << width) - 1
+    for g in range(first, len(groups)):
+        bits = (found >> (g * width)) & group_mask
+        out.append(bits == group_mask if need_all else bits != 0)
+    return out
+
+
+def match_all(_t: str) -> bool:
+    return True
+
+
+def _find_bounded(text: str, pattern: str) -> bool:
+    if not pattern:
+        return False
+    n = len(text)
+    start_word = _is_word(pattern[0])
+    end_word = _is_word(pattern[-1])
+    i = text.find(pattern)
+    while i >= 0:
+        j = i + len(pattern)
+        before = i > 0 and _is_word(text[i - 1])
+        after = j < n and _is_word(text[j])
+        if before != start_word and after != end_word:
+            return True
+        i = text.find(pattern, i + 1)
+    return False
+
+
+@timed("crib.matching_shifts")
+def matching_shifts(
+    text: str,
+    hints: list[str],
+    mode: str,
+    ignore_case: bool,
+    word_boundary: bool,
+    alphabet: Alphabet = LATIN,
+) -> list[bool] | None:
+    n_shifts = alphabet.size
+    if not hints:
+        return [True] * n_shifts
+    if (word_boundary and not alphabet.preserves_word_class) or (ignore_case and not alphabet.case_symmetric):
+        return None
+    if ignore_case and not text.isascii() and any(ch in text for ch in _FOLDS_TO_ASCII):
+        # lower() folds these into ASCII letters, which would then be searched
+        # as if they were shifted.
+        return None
+
+    t = text.lower() if ignore_case else text
+    hs = [h.lower() for h in hints] if ignore_case else list(hints)
+
+    if not word_boundary and len(hs) >= _AUTOMATON_MIN_HINTS:
+        groups = [tuple(encrypt(h, k, alphabet) for h in hs) for k in range(n_shifts)]
+        patterns = tuple(p for group in groups for p in group)
+        return _match_groups(t, groups, mode == "AND", lambda: compile_automaton(patterns))
+
+    def present(p: str) -> bool:
+        return _find_bounded(t, p) if word_boundary else p in t
+
+    agg = all if mode == "AND" else any
+    return [agg(present(encrypt(h, k, alphabet)) for h in hs) for k in range(n_shifts)]
+
+
+def _combine_or(patterns: list[re.Pattern], flags: int) -> re.Pattern | None:
+    if len(patterns) < 2 or any(p.groups for p in patterns):
+        return None
+    try:
+        return re.compile("|".join(f"(?:{p.pattern})" for p in patterns), flags)
+    except re.error:
+        return None
+
+
+@timed("crib.build_matcher")
 def build_matcher(
     hints: list[str],
     mode: str,
     ignore_case: bool,
     use_regex: bool,
     word_boundary: bool,
+) -> tuple[Callable[[str], bool], str | None]:
+    return _build_matcher_cached(tuple(hints), mode, ignore_case, use_regex, word_boundary)
+
+
+def matcher_cache_info():
+    return _build_matcher_cached.cache_info()
+
+
+def clear_matcher_cache() -> None:
+    _build_matcher_cached.cache_clear()
+
+
+@lru_cache(maxsize=_MATCHER_CACHE_SIZE)
+def _build_matcher_cached(
+    hints: tuple[str, ...],
+    mode: str,
+    ignore_case: bool,
+    use_regex: bool,
+    word_boundary: bool,
 ) -> tuple[Callable[[str], bool], str | None]:
     if not hints:
-        return (lambda _t: True), None
+        return match_all, None
 
     if not use_regex and not word_boundary:
+        if len(hints) >= _AUTOMATON_MIN_HINTS:
+            patterns = tuple(h.lower() for h in hints) if ignore_case else hints
+            need_all = mode == "AND"
+
+            def match(t: str) -> bool:
+                text = t.lower() if ignore_case else t
+                return _match_groups(text, [patterns], need_all, lambda: compile_automaton(patterns))[0]
+
+            return match, None
+
         if ignore_case:
             hs = [h.lower() for h in hints]
 
@@ -62,6 +263,14 @@ def build_matcher(
         except re.error as e:
             return (lambda _t: False), f"Regex error: {e}"
 
+    if mode == "OR":
+        combined = _combine_or(patterns, flags)
+        if combined is not None:
+            def match(t: str) -> bool:
+                return combined.search(t) is not None
+
+            return match, None
+
     def match(t: str) -> bool:
         if mode == "AND":
             return all(p.search(t) is not None for p in patterns)
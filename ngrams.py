@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import math
+import mmap
+import os
+import sys
+import tempfile
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from perf import timed
+
+
+QUADGRAM_ENV = "SHIFTSLEUTH_QUADGRAMS"
+TABLE_SIZE = 26 ** 4
+_CHUNK = 1 << 16
+
+_LETTER_VALUES = bytes.maketrans(
+    b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz",
+    bytes(range(26)) * 2,
+)
+_NON_LETTERS = bytes(b for b in range(256) if not (65 <= b <= 90 or 97 <= b <= 122))
+_ROTATE = [bytes((v - k) % 26 if v < 26 else v for v in range(256)) for k in range(26)]
+
+_table = None
+_floor = None
+
+
+def letter_values(text: str | bytes | memoryview) -> bytes:
+    if isinstance(text, memoryview):
+        # Only the letters are kept, so never copy the whole buffer at once.
+        return b"".join(
+            text[start:start + _CHUNK].tobytes().translate(_LETTER_VALUES, _NON_LETTERS)
+            for start in range(0, len(text), _CHUNK)
+        )
+    data = text.encode("utf-8", "surrogatepass") if isinstance(text, str) else bytes(text)
+    return data.translate(_LETTER_VALUES, _NON_LETTERS)
+
+
+def build_table(corpus: str) -> array:
+    counts = array("I", bytes(4 * TABLE_SIZE))
+    seq = letter_values(corpus)
+    code = 0
+    for i, v in enumerate(seq):
+        code = (code * 26 + v) % TABLE_SIZE
+        if i >= 3:
+            counts[code] += 1
+
+    n = max(1, len(seq) - 3)
+    floor = math.log10(0.01 / n)
+    return array("f", (math.log10(c / n) if c else floor for c in counts))
+
+
+def _default_corpus() -> str:
+    from pydoc_data.topics import topics
+
+    return "\n".join(topics.values())
+
+
+def default_table_path() -> str:
+    env = os.environ.get(QUADGRAM_ENV)
+    if env:
+        return env
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "shiftsleuth", "quadgrams-en.f32")
+
+
+def save_table(table: array, path: str) -> None:
+    # Several processes may build the table on first use; each writes its own
+    # temporary file and the last complete one to land wins.
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            table.tofile(f)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def load_table(path: str) -> memoryview:
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(mm) != 4 * TABLE_SIZE:
+        mm.close()
+        raise ValueError(f"{path} is not a packed quadgram table")
+    return memoryview(mm).cast("f")
+
+
+def quadgram_table() -> memoryview:
+    global _table
+    if _table is None:
+        path = default_table_path()
+        if not os.path.exists(path):
+            table = build_table(_default_corpus())
+            try:
+                save_table(table, path)
+            except OSError:
+                # Nowhere to keep it (read-only home, sandbox): use it from memory.
+                _table = memoryview(table)
+                return _table
+        _table = load_table(path)
+    return _table
+
+
+def _score_values(seq: bytes, table) -> float:
+    code = 0
+    score = 0.0
+    for i, v in enumerate(seq):
+        code = (code * 26 + v) % TABLE_SIZE
+        if i >= 3:
+            score += table[code]
+    return score
+
+
+def _scores_numpy(seq: bytes, table, shifts: list[int]) -> list[float]:
+    lut = np.frombuffer(table, dtype=np.float32)
+    rows = np.array(shifts, dtype=np.int32)[:, None]
+    totals = np.zeros(len(shifts), dtype=np.float64)
+    for start in range(0, max(1, len(seq) - 3), _CHUNK):
+        window = np.frombuffer(seq[start:start + _CHUNK + 3], dtype=np.uint8).astype(np.int32)
+        if len(window) < 4:
+            break
+        v = (window[None, :] - rows) % 26
+        codes = ((v[:, :-3] * 26 + v[:, 1:-2]) * 26 + v[:, 2:-1]) * 26 + v[:, 3:]
+        totals += lut[codes].sum(axis=1, dtype=np.float64)
+    return totals.tolist()
+
+
+def quadgram_floor() -> float:
+    # Cost of a quadgram the table never saw: the most any one quadgram can add.
+    global _floor
+    if _floor is None:
+        table = quadgram_table()
+        _floor = -float(np.frombuffer(table, dtype=np.float32).min() if np is not None else min(table))
+    return _floor
+
+
+def quadgram_fit(text: str | bytes) -> tuple[float, int]:
+    # Summed cost and the number of quadgrams it covers.
+    seq = letter_values(text)
+    if len(seq) < 4:
+        return 0.0, 0
+    return -_score_values(seq, quadgram_table()), len(seq) - 3
+
+
+def quadgram_score(text: str | bytes) -> float:
+    seq = letter_values(text)
+    if len(seq) < 4:
+        return float("inf")
+    return -_score_values(seq, quadgram_table())
+
+
+@timed("ngrams.quadgram_scores")
+def quadgram_scores(text: str | bytes, shifts: list[int] | None = None) -> list[float]:
+    seq = letter_values(text)
+    scores = [float("inf")] * 26
+    if len(seq) < 4:
+        return scores
+    shifts = list(range(26)) if shifts is None else [k % 26 for k in shifts]
+    if not shifts:
+        return scores
+    table = quadgram_table()
+    if np is not None:
+        values = _scores_numpy(seq, table, shifts)
+    else:
+        values = [_score_values(seq.translate(_ROTATE[k]), table) for k in shifts]
+    for k, v in zip(shifts, values):
+        scores[k] = -v
+    return scores
+
+
+def main(argv: list[str] | None = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2:
+        print("usage: python ngrams.py CORPUS.txt OUTPUT.f32", file=sys.stderr)
+        return 2
+    with open(argv[0], encoding="utf-8", errors="replace") as f:
+        save_table(build_table(f.read()), argv[1])
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import functools
+import json
+import os
+import threading
+from collections import deque
+from time import perf_counter_ns
+
+PERF_ENV = "SHIFTSLEUTH_PERF"
+WINDOW = 512
+TRACE_LIMIT = 100_000
+
+# Core functions are only wrapped when the process starts with SHIFTSLEUTH_PERF
+# set, so a normal run calls them directly. Spans can be switched on at any time.
+_instrumented = bool(os.environ.get(PERF_ENV))
+_enabled = _instrumented
+_samples: dict[str, deque] = {}
+_trace: deque = deque(maxlen=TRACE_LIMIT)
+_origin = perf_counter_ns()
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, self.start, perf_counter_ns())
+        return False
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def instrumented() -> bool:
+    return _instrumented
+
+
+def enable(flag: bool = True) -> None:
+    global _enabled
+    _enabled = flag
+
+
+def reset() -> None:
+    _samples.clear()
+    _trace.clear()
+
+
+def record(name: str, start_ns: int, end_ns: int) -> None:
+    samples = _samples.get(name)
+    if samples is None:
+        samples = _samples.setdefault(name, deque(maxlen=WINDOW))
+    samples.append(end_ns - start_ns)
+    _trace.append((name, start_ns, end_ns - start_ns, threading.get_ident()))
+
+
+def span(name: str):
+    return _Span(name) if _enabled else _NULL_SPAN
+
+
+def timed(name: str):
+    def decorate(fn):
+        if not _instrumented:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            start = perf_counter_ns()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(name, start, perf_counter_ns())
+
+        return wrapper
+
+    return decorate
+
+
+def _percentile(ordered: list[int], q: float) -> int:
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def stats() -> dict[str, tuple[int, float, float]]:
+    out = {}
+    for name, samples in list(_samples.items()):
+        ordered = sorted(samples)
+        if ordered:
+            out[name] = (len(ordered), _percentile(ordered, 0.5) / 1e6, _percentile(ordered, 0.95) / 1e6)
+    return out
+
+
+def format_stats() -> str:
+    rows = sorted(stats().items())
+    if not rows:
+        return "no samples yet"
+    width = max(len(name) for name, _ in rows)
+    lines = [f"{'stage':<{width}}     n    p50 ms    p95 ms"]
+    for name, (n, p50, p95) in rows:
+        lines.append(f"{name:<{width}} {n:5d} {p50:9.2f} {p95:9.2f}")
+    return "\n".join(lines)
+
+
+def chrome_trace() -> dict:
+    pid = os.getpid()
+    events = [
+        {
+            "name": name,
+            "cat": name.split(".", 1)[0],
+            "ph": "X",
+            "ts": (start - _origin) / 1000,
+            "dur": dur / 1000,
+            "pid": pid,
+            "tid": tid,
+        }
+        for name, start, dur, tid in list(_trace)
+    ]
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def export_chrome_trace(path: str) -> int:
+    trace = chrome_trace()
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(trace, f)
+    return len(trace["traceEvents"])
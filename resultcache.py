@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from multiprocessing import util
+
+from scoring import Histogram
+
+
+CACHE_ENV = "SHIFTSLEUTH_CACHE"
+MEMORY_ENTRIES = 4096
+DISK_BYTES = 64 << 20
+# Bump when the scorers change so stale rows on disk are never served.
+_FORMAT = b"shiftsleuth-results-1"
+_EVICT_SLACK = 0.1
+# Inserts are committed in batches; a row's last-used stamp is only refreshed
+# once it is this stale, so a warm hit is a single SELECT.
+_WRITE_BATCH = 256
+_WRITE_DELAY = 1.0
+_TOUCH_SECONDS = 60.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key BLOB PRIMARY KEY,
+    shift INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    counts BLOB NOT NULL,
+    scores BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    used REAL NOT NULL
+)
+"""
+
+
+class CachedResult:
+    __slots__ = ("hist", "scores", "shift")
+
+    def __init__(self, hist: Histogram, scores, shift: int | None = None):
+        self.hist = hist
+        self.scores = scores if isinstance(scores, array) else array("d", scores)
+        self.shift = self.scores.index(min(self.scores)) if shift is None else shift
+
+    def __repr__(self) -> str:
+        return f"CachedResult(shift={self.shift}, total={self.hist.total})"
+
+
+def content_key(text: str | bytes, alphabet_name: str, scorer: str) -> bytes:
+    h = hashlib.blake2b(_FORMAT, digest_size=16)
+    h.update(f"\0{alphabet_name}\0{scorer}\0".encode())
+    h.update(text.encode("utf-8", "surrogatepass") if isinstance(text, str) else text)
+    return h.digest()
+
+
+class ResultCache:
+    def __init__(
+        self,
+        path: str | None = None,
+        max_entries: int = MEMORY_ENTRIES,
+        max_bytes: int = DISK_BYTES,
+    ):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory: OrderedDict[bytes, CachedResult] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._disk_size = 0
+        self._pending: dict[bytes, tuple] = {}
+        self._pending_since = 0.0
+        if path:
+            self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            # A lost write only costs a recomputation, so skip the fsync per insert.
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(_SCHEMA)
+            self._disk_size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def __repr__(self) -> str:
+        return f"ResultCache(path={self.path!r}, entries={len(self._memory)})"
+
+    def key(self, text: str | bytes, alphabet, scorer: str) -> bytes:
+        return content_key(text, alphabet.name, scorer)
+
+    def get(self, key: bytes) -> CachedResult | None:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry
+            entry = self._load(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, entry)
+            return entry
+
+    def put(self, key: bytes, entry: CachedResult) -> None:
+        with self._lock:
+            self._remember(key, entry)
+            if self._db is not None:
+                self._store(key, entry)
+
+    def info(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "entries": len(self._memory),
+            "disk_bytes": self._disk_size,
+        }
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._pending.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM results")
+                self._disk_size = 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._flush()
+                self._db.close()
+                self._db = None
+
+    def _remember(self, key: bytes, entry: CachedResult) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _load(self, key: bytes) -> CachedResult | None:
+        if self._db is None:
+            return None
+        pending = self._pending.get(key)
+        if pending is not None:
+            return CachedResult(Histogram(array("I", pending[3]), pending[2]), array("d", pending[4]), pending[1])
+        row = self._db.execute(
+            "SELECT shift, total, counts, scores, used FROM results WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        shift, total, counts, scores, used = row
+        now = time.time()
+        if now - used > _TOUCH_SECONDS:
+            self._db.execute("UPDATE results SET used = ? WHERE key = ?", (now, key))
+        hist = Histogram(array("I", counts), total)
+        return CachedResult(hist, array("d", scores), shift)
+
+    def _store(self, key: bytes, entry: CachedResult) -> None:
+        counts = entry.hist.counts.tobytes()
+        scores = entry.scores.tobytes()
+        size = len(key) + len(counts) + len(scores)
+        now = time.time()
+        if not self._pending:
+            self._pending_since = now
+        self._pending[key] = (key, entry.shift, entry.hist.total, counts, scores, size, now)
+        if len(self._pending) >= _WRITE_BATCH or now - self._pending_since >= _WRITE_DELAY:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._db is None or not self._pending:
+            return
+        rows, self._pending = list(self._pending.values()), {}
+        self._db.execute("BEGIN")
+        try:
+            cur = self._db.executemany("INSERT OR IGNORE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            if cur.rowcount == len(rows):
+                self._disk_size += sum(row[5] for row in rows)
+            else:
+                self._disk_size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            if self._disk_size > self.max_bytes:
+                self._evict()
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+
+    def _evict(self) -> None:
+        # Other processes may share the file, so recount before deleting and
+        # free a little extra to avoid evicting on every insert.
+        self._disk_size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        excess = self._disk_size - int(self.max_bytes * (1.0 - _EVICT_SLACK))
+        if self._disk_size <= self.max_bytes or excess <= 0:
+            return
+        freed = 0
+        doomed = []
+        for key, size in self._db.execute("SELECT key, size FROM results ORDER BY used"):
+            doomed.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._db.executemany("DELETE FROM results WHERE key = ?", doomed)
+        self._disk_size -= freed
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_cache() -> ResultCache:
+    # One cache per process. SHIFTSLEUTH_CACHE names an SQLite file that the
+    # GUI, the CLI and its worker processes can all share. Pool workers leave
+    # through os._exit and skip atexit hooks, but multiprocessing still runs
+    # its finalizers there, so pending rows are flushed through one.
+    global _default
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = ResultCache(os.environ.get(CACHE_ENV) or None)
+                util.Finalize(_default, _default.flush, exitpriority=10)
+    return _default
+
+
+__all__ = [
+    "CACHE_ENV",
+    "CachedResult",
+    "ResultCache",
+    "content_key",
+    "default_cache",
+]
@@ -1,6 +1,19 @@
 from __future__ import annotations
 
 import math
+import mmap
+import os
+from array import array
+from operator import add, sub
+from typing import BinaryIO
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from ngrams import _LETTER_VALUES, _NON_LETTERS
+from perf import timed
 
 
 ENGLISH_FREQ = [
@@ -10,8 +23,43 @@ ENGLISH_FREQ = [
     0.01974, 0.00074
 ]
 
+# A-Z only: accented letters are not counted, so each table is renormalised
+# over the plain Latin letters.
+GERMAN_FREQ = [
+    0.06671, 0.01931, 0.02797, 0.05197, 0.16786, 0.01695, 0.03080, 0.04686,
+    0.06706, 0.00274, 0.01451, 0.03519, 0.02594, 0.10008, 0.02656, 0.00686,
+    0.00018, 0.07169, 0.07443, 0.06300, 0.04265, 0.00866, 0.01967, 0.00035,
+    0.00040, 0.01161
+]
+
+FRENCH_FREQ = [
+    0.07854, 0.00927, 0.03353, 0.03774, 0.15135, 0.01096, 0.00891, 0.00758,
+    0.07744, 0.00630, 0.00076, 0.05612, 0.03053, 0.07297, 0.05961, 0.02593,
+    0.01401, 0.06884, 0.08175, 0.07451, 0.06491, 0.01890, 0.00050, 0.00439,
+    0.00132, 0.00335
+]
+
+SPANISH_FREQ = [
+    0.11879, 0.02283, 0.04142, 0.05164, 0.12555, 0.00713, 0.01822, 0.00725,
+    0.06439, 0.00508, 0.00011, 0.05119, 0.03254, 0.06918, 0.08950, 0.02587,
+    0.00904, 0.07082, 0.08222, 0.04774, 0.03017, 0.01173, 0.00018, 0.00222,
+    0.01039, 0.00481
+]
+
+
+_NUMPY_MIN_LEN = 64
+# Below this many bytes, folding letters with translate() and counting them
+# beats the fixed cost of a numpy bincount.
+_HISTOGRAM_NUMPY_MIN_LEN = 512
+# Buffers counted without numpy are copied out this many bytes at a time.
+_VIEW_CHUNK = 1 << 16
+_OTHER_FREQ = 0.05
+_UPPER_FREQ = 0.1
+_VALUE_BYTES = [bytes([i]) for i in range(26)]
+_ZERO_COUNTS = array("I", [0]) * 26
 
-def letter_counts_az(text: str) -> tuple[list[int], int]:
+
+def _letter_counts_az_python(text: str) -> tuple[list[int], int]:
     counts = [0] * 26
     total = 0
     for ch in text:
@@ -25,48 +73,366 @@ def letter_counts_az(text: str) -> tuple[list[int], int]:
     return counts, total
 
 
+def _letter_counts_az_bytes(data: bytes) -> tuple[array, int]:
+    letters = data.translate(_LETTER_VALUES, _NON_LETTERS)
+    return array("I", map(letters.count, _VALUE_BYTES)), len(letters)
+
+
+def _view_chunks(view: memoryview):
+    for start in range(0, len(view), _VIEW_CHUNK):
+        with view[start:start + _VIEW_CHUNK] as chunk:
+            yield chunk.tobytes()
+
+
+def _letter_counts_az_numpy(text: str | bytes) -> tuple[array, int]:
+    data = text.encode("utf-8", "surrogatepass") if isinstance(text, str) else text
+    hist = np.bincount(np.frombuffer(data, dtype=np.uint8), minlength=256)
+    counts = hist[65:91] + hist[97:123]
+    return array("I", counts.tolist()), int(counts.sum())
+
+
+class Histogram:
+    __slots__ = ("counts", "total")
+
+    def __init__(self, counts=None, total: int | None = None):
+        self.counts = array("I", _ZERO_COUNTS if counts is None else counts)
+        if len(self.counts) != 26:
+            raise ValueError("a histogram has exactly 26 slots")
+        self.total = sum(self.counts) if total is None else total
+
+    @classmethod
+    def from_text(cls, text: str | bytes) -> "Histogram":
+        use_numpy = np is not None and len(text) >= _HISTOGRAM_NUMPY_MIN_LEN
+        if isinstance(text, memoryview) and not use_numpy:
+            hist = cls()
+            for chunk in _view_chunks(text):
+                hist.merge(cls.from_text(chunk))
+            return hist
+        if use_numpy:
+            counts, total = _letter_counts_az_numpy(text)
+        else:
+            data = text.encode("utf-8", "surrogatepass") if isinstance(text, str) else text
+            counts, total = _letter_counts_az_bytes(data)
+        hist = cls.__new__(cls)
+        hist.counts = counts
+        hist.total = total
+        return hist
+
+    def __repr__(self) -> str:
+        return f"Histogram(total={self.total})"
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Histogram) and self.counts == other.counts
+
+    def copy(self) -> "Histogram":
+        return Histogram(self.counts, self.total)
+
+    def merge(self, other: "Histogram") -> "Histogram":
+        self.counts = array("I", map(add, self.counts, other.counts))
+        self.total += other.total
+        return self
+
+    def subtract(self, other: "Histogram") -> "Histogram":
+        try:
+            self.counts = array("I", map(sub, self.counts, other.counts))
+        except OverflowError:
+            raise ValueError("cannot subtract counts that were never added") from None
+        self.total -= other.total
+        return self
+
+    def rotated(self, shift: int) -> "Histogram":
+        s = shift % 26
+        return Histogram(self.counts[s:] + self.counts[:s], self.total)
+
+    def tolist(self) -> list[int]:
+        return self.counts.tolist()
+
+    def chi_square_scores(self, out: array | None = None) -> array:
+        if out is None:
+            out = array("d", [0.0]) * 26
+        if self.total == 0:
+            for shift in range(26):
+                out[shift] = math.inf
+        elif np is not None:
+            obs = np.frombuffer(self.counts, dtype=np.uintc).astype(np.float64)
+            _chi_square_identity_numpy(obs, self.total, np.frombuffer(out, dtype=np.float64))
+        else:
+            for shift in range(26):
+                out[shift] = _chi_square_rotated(self.counts, self.total, shift)
+        return out
+
+
+@timed("scoring.letter_counts_az")
+def letter_counts_az(text: str | bytes) -> tuple[list[int], int]:
+    hist = Histogram.from_text(text)
+    return hist.tolist(), hist.total
+
+
+@timed("scoring.alphabet_counts")
+def alphabet_counts(text: str | bytes, alphabet) -> tuple[list[int], int]:
+    if not isinstance(text, str) and not alphabet.is_ascii:
+        raise TypeError("bytes input needs an ASCII alphabet")
+    if isinstance(text, memoryview) and (np is None or len(text) < _NUMPY_MIN_LEN):
+        counts = [0] * len(alphabet.members)
+        for chunk in _view_chunks(text):
+            add_counts(counts, [chunk.count(b) for b in alphabet.member_bytes])
+        return counts, sum(counts)
+    if alphabet.is_ascii and np is not None and len(text) >= _NUMPY_MIN_LEN:
+        data = text.encode("utf-8", "surrogatepass") if isinstance(text, str) else text
+        hist = np.bincount(np.frombuffer(data, dtype=np.uint8), minlength=256)
+        counts = hist[alphabet.member_codes].tolist()
+    elif isinstance(text, str):
+        counts = [text.count(ch) for ch in alphabet.members]
+    else:
+        counts = [text.count(b) for b in alphabet.member_bytes]
+    return counts, sum(counts)
+
+
+def add_counts(acc: list[int], counts: list[int]) -> None:
+    for i, c in enumerate(counts):
+        acc[i] += c
+
+
+def _counter(alphabet):
+    if alphabet is None:
+        return letter_counts_az, 26
+    return (lambda data: alphabet_counts(data, alphabet)), len(alphabet.members)
+
+
+def letter_counts_stream(src: BinaryIO, chunk_size: int = 1 << 20, alphabet=None) -> tuple[list[int], int]:
+    count, size = _counter(alphabet)
+    acc = [0] * size
+    total = 0
+    while True:
+        chunk = src.read(chunk_size)
+        if not chunk:
+            return acc, total
+        counts, n = count(chunk)
+        add_counts(acc, counts)
+        total += n
+
+
+def letter_counts_file(path: str, chunk_size: int = 1 << 22, alphabet=None) -> tuple[list[int], int]:
+    count, size = _counter(alphabet)
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return [0] * size, 0
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            acc = [0] * size
+            total = 0
+            with memoryview(mm) as view:
+                for start in range(0, len(mm), chunk_size):
+                    with view[start:start + chunk_size] as chunk:
+                        counts, n = count(chunk)
+                    add_counts(acc, counts)
+                    total += n
+            return acc, total
+
+
+class LanguageModel:
+    __slots__ = ("code", "name", "freq", "inverse", "freq_sum")
+
+    def __init__(self, code: str, name: str, freq: list[float]):
+        if len(freq) != 26:
+            raise ValueError("a language model needs 26 letter frequencies")
+        if min(freq) <= 0:
+            raise ValueError("letter frequencies must be positive")
+        self.code = code
+        self.name = name
+        self.freq = tuple(freq)
+        self.inverse = tuple(1.0 / f for f in freq)
+        self.freq_sum = sum(freq)
+
+    def __repr__(self) -> str:
+        return f"LanguageModel({self.code!r}, {self.name!r})"
+
+
+LANGUAGES: dict[str, LanguageModel] = {}
+_LANGUAGE_STACKS: dict[tuple[str, ...], tuple] = {}
+
+
+def register_language(model: LanguageModel) -> LanguageModel:
+    LANGUAGES[model.code] = model
+    _LANGUAGE_STACKS.clear()
+    return model
+
+
+def resolve_languages(languages=None) -> tuple[str, ...]:
+    codes = tuple(LANGUAGES) if languages is None else tuple(languages)
+    if not codes:
+        raise ValueError("at least one language is needed")
+    for code in codes:
+        if code not in LANGUAGES:
+            raise ValueError(f"unknown language: {code}")
+    return codes
+
+
+ENGLISH = register_language(LanguageModel("en", "English", ENGLISH_FREQ))
+GERMAN = register_language(LanguageModel("de", "German", GERMAN_FREQ))
+FRENCH = register_language(LanguageModel("fr", "French", FRENCH_FREQ))
+SPANISH = register_language(LanguageModel("es", "Spanish", SPANISH_FREQ))
+
+
+def _chi_square_rotated(counts: list[int], total: float, shift: int, model: LanguageModel = ENGLISH) -> float:
+    # sum((o - e)^2 / e) == sum(o^2 / e) - 2 * sum(o) + sum(e) with e = f * total,
+    # so only the precomputed reciprocals are needed per letter.
+    inverse = model.inverse
+    squares = 0.0
+    observed = 0
+    for i in range(26):
+        c = counts[(i + shift) % 26]
+        squares += c * c * inverse[i]
+        observed += c
+    return squares / total - 2 * observed + total * model.freq_sum
+
+
 def chi_square_score(text: str) -> float:
     counts, total = letter_counts_az(text)
     if total == 0:
         return float("inf")
+    return _chi_square_rotated(counts, total, 0)
 
-    score = 0.0
-    for i in range(26):
-        exp = ENGLISH_FREQ[i] * total
-        if exp > 0:
-            diff = counts[i] - exp
-            score += (diff * diff) / exp
-    return score
 
+_FREQ_SUM = ENGLISH.freq_sum
+
+if np is not None:
+    _ROTATION_INDEX_NP = (np.arange(26)[None, :] - np.arange(26)[:, None]) % 26
+
+
+def _inverse_rotations(model: LanguageModel):
+    # Row s holds the reciprocal frequencies lined up with a histogram rotated by s.
+    return np.array(model.inverse)[_ROTATION_INDEX_NP]
+
+
+if np is not None:
+    _INV_FREQ_ROTATIONS_NP = _inverse_rotations(ENGLISH)
+
+
+def _chi_square_scores_python(counts: list[int], total: int) -> list[float]:
+    return [_chi_square_rotated(counts, total, shift) for shift in range(26)]
+
+
+def _chi_square_identity_numpy(obs, total: int, out):
+    # sum((o - e)^2 / e) == sum(o^2 / e) - 2N + N * sum(f): one 26x26 product
+    # instead of materialising every rotation.
+    np.dot(_INV_FREQ_ROTATIONS_NP, obs * obs, out=out)
+    out /= total
+    out += total * (_FREQ_SUM - 2.0)
+    return out
 
-def confidence_percent(scores: list[float]) -> list[float]:
-    finite = [s for s in scores if math.isfinite(s)]
-    if not finite:
-        return [0.0 for _ in scores]
-
-    m = min(finite)
-    adj = []
-    for s in scores:
-        if math.isfinite(s):
-            adj.append(s - m)
-        else:
-            adj.append(float("inf"))
 
-    finite_adj = [a for a in adj if math.isfinite(a)]
-    mx = max(finite_adj) if finite_adj else 1.0
+def _chi_square_scores_numpy(counts: list[int], total: int) -> list[float]:
+    obs = np.asarray(counts, dtype=np.float64)
+    return _chi_square_identity_numpy(obs, total, np.empty(26)).tolist()
+
+
+@timed("scoring.chi_square_scores")
+def chi_square_scores(counts: list[int], total: int) -> list[float]:
+    if total == 0:
+        return [float("inf")] * 26
+    if np is not None:
+        return _chi_square_scores_numpy(counts, total)
+    return _chi_square_scores_python(counts, total)
+
+
+def _language_stack(codes: tuple[str, ...]):
+    stack = _LANGUAGE_STACKS.get(codes)
+    if stack is None:
+        models = [LANGUAGES[code] for code in codes]
+        rotations = np.concatenate([_inverse_rotations(m) for m in models])
+        offsets = np.repeat([m.freq_sum - 2.0 for m in models], 26)
+        stack = _LANGUAGE_STACKS[codes] = (rotations, offsets)
+    return stack
+
+
+@timed("scoring.language_scores")
+def language_scores(counts: list[int], total: int, languages=None) -> dict[str, list[float]]:
+    # Every language adds 26 rows to one stacked product, so scoring against all
+    # of them costs a single matrix-vector multiply.
+    codes = resolve_languages(languages)
+    if total == 0:
+        return {code: [float("inf")] * 26 for code in codes}
+    if np is None:
+        return {
+            code: [_chi_square_rotated(counts, total, shift, LANGUAGES[code]) for shift in range(26)]
+            for code in codes
+        }
+    rotations, offsets = _language_stack(codes)
+    obs = np.asarray(counts, dtype=np.float64)
+    rows = rotations @ (obs * obs)
+    rows /= total
+    rows += total * offsets
+    return dict(zip(codes, rows.reshape(len(codes), 26).tolist()))
+
+
+def _chi_square_bin(observed: int, expected: float) -> float:
+    diff = observed - expected
+    return diff * diff / expected
+
+
+@timed("scoring.alphabet_scores")
+def alphabet_scores(counts: list[int], alphabet, model: LanguageModel = ENGLISH) -> list[float]:
+    n = alphabet.size
+    fixed = [0] * 26
+    for idx, letter in alphabet.fixed_slots:
+        fixed[letter] += counts[idx]
+
+    total = sum(counts)
+    if total == 0:
+        return [float("inf")] * n
+
+    in_alphabet = sum(counts[:len(alphabet.chars)])
+    letter_share = 1.0 - _OTHER_FREQ if alphabet.mixes_letters else 1.0
+
+    scores = []
+    for shift in range(n):
+        folded = fixed[:]
+        upper = 0
+        for j, p, letter, is_upper in alphabet.letter_slots:
+            c = counts[j * n + (p + shift) % n]
+            folded[letter] += c
+            if is_upper:
+                upper += c
+        score = _chi_square_rotated(folded, total * letter_share, 0, model)
+
+        if alphabet.mixes_letters:
+            other = in_alphabet - (sum(folded) - sum(fixed))
+            score += _chi_square_bin(other, _OTHER_FREQ * total)
+        letters = sum(folded)
+        if alphabet.mixes_case and letters:
+            score += _chi_square_bin(upper, _UPPER_FREQ * letters)
+            score += _chi_square_bin(letters - upper, (1.0 - _UPPER_FREQ) * letters)
+        scores.append(score)
+    return scores
+
+
+def confidence_inplace(scores: array) -> array:
+    isfinite = math.isfinite
+    m = min(filter(isfinite, scores), default=None)
+    if m is None:
+        for i in range(len(scores)):
+            scores[i] = 0.0
+        return scores
+
+    mx = max(filter(isfinite, scores)) - m
     if mx <= 0:
-        return [100.0 if a == 0 else 0.0 for a in adj]
+        for i, s in enumerate(scores):
+            scores[i] = 100.0 if s == m else 0.0
+        return scores
 
     k = 5.0
-    weights = []
-    for a in adj:
-        if math.isfinite(a):
-            weights.append(math.exp(-k * (a / mx)))
-        else:
-            weights.append(0.0)
+    exp = math.exp
+    total = 0.0
+    for i, s in enumerate(scores):
+        w = exp(-k * ((s - m) / mx)) if isfinite(s) else 0.0
+        scores[i] = w
+        total += w
 
-    s = sum(weights)
-    if s <= 0:
-        return [0.0 for _ in scores]
+    for i, w in enumerate(scores):
+        scores[i] = w / total * 100.0
+    return scores
 
-    return [w / s * 100.0 for w in weights]
+
+@timed("scoring.confidence_percent")
+def confidence_percent(scores: list[float]) -> list[float]:
+    return confidence_inplace(array("d", scores)).tolist()
@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import re
+from itertools import repeat
+from operator import add, mul
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from ngrams import letter_values
+from perf import timed
+from scoring import LANGUAGES, LanguageModel, _inverse_rotations
+
+
+DEFAULT_WINDOW = 200
+_NUMPY_MIN_LETTERS = 1 << 12
+# Letters per numpy chunk, so the prefix counts stay a few MB at any step.
+_CHUNK_LETTERS = 1 << 16
+_LETTER_RUN = re.compile(r"[A-Za-z]+")
+_LETTER_RUN_BYTES = re.compile(rb"[A-Za-z]+")
+
+
+class Segment:
+    __slots__ = ("start", "end", "shift", "score")
+
+    def __init__(self, start: int, end: int, shift: int, score: float):
+        self.start = start
+        self.end = end
+        self.shift = shift
+        self.score = score
+
+    def __repr__(self) -> str:
+        return f"Segment({self.start}:{self.end}, shift={self.shift}, score={self.score:.3f})"
+
+
+class SegmentProfile:
+    __slots__ = ("window", "step", "offsets", "shifts", "scores", "segments")
+
+    def __init__(self, window: int, step: int, offsets, shifts, scores, segments):
+        self.window = window
+        self.step = step
+        self.offsets = offsets
+        self.shifts = shifts
+        self.scores = scores
+        self.segments = segments
+
+    def __repr__(self) -> str:
+        return f"SegmentProfile(windows={len(self.shifts)}, segments={len(self.segments)})"
+
+
+def _rolling_python(values: bytes, window: int, step: int, model: LanguageModel) -> tuple[list[int], list[float]]:
+    # acc[s] == sum(counts[j]^2 / f[j - s]) for the letters in the window. Moving
+    # the window changes one count up and one down, and (c +- 1)^2 - c^2 == 2c +- 1,
+    # so each step is two 26-wide row updates instead of a rescan.
+    inverse = model.inverse
+    rows = [[inverse[(j - s) % 26] for s in range(26)] for j in range(26)]
+    counts = [0] * 26
+    acc = [0.0] * 26
+    for j in values[:window]:
+        acc = list(map(add, acc, map(mul, rows[j], repeat(2 * counts[j] + 1))))
+        counts[j] += 1
+
+    shifts = []
+    scores = []
+    for start in range(len(values) - window + 1):
+        if start:
+            j_out = values[start - 1]
+            j_in = values[start + window - 1]
+            if j_in != j_out:
+                acc = list(map(add, acc, map(mul, rows[j_out], repeat(1 - 2 * counts[j_out]))))
+                counts[j_out] -= 1
+                acc = list(map(add, acc, map(mul, rows[j_in], repeat(2 * counts[j_in] + 1))))
+                counts[j_in] += 1
+        if start % step == 0:
+            best = min(acc)
+            shifts.append(acc.index(best))
+            scores.append(best)
+    return shifts, scores
+
+
+def _rolling_numpy(values: bytes, window: int, step: int, model: LanguageModel) -> tuple[list[int], list[float]]:
+    # Window histograms are differences of prefix counts, chunk by chunk, and the
+    # same reciprocal rotations as scoring score every window in one product.
+    v = np.frombuffer(values, dtype=np.uint8)
+    rotations = _inverse_rotations(model)
+    starts = np.arange(0, len(v) - window + 1, step)
+    per_chunk = max(1, _CHUNK_LETTERS // step)
+    shifts = []
+    scores = []
+    for first in range(0, len(starts), per_chunk):
+        chunk = starts[first:first + per_chunk]
+        lo, hi = int(chunk[0]), int(chunk[-1]) + window
+        onehot = np.zeros((hi - lo + 1, 26), dtype=np.int32)
+        onehot[np.arange(1, hi - lo + 1), v[lo:hi]] = 1
+        prefix = np.cumsum(onehot, axis=0, out=onehot)
+        hist = (prefix[chunk - lo + window] - prefix[chunk - lo]).astype(np.float64)
+        acc = (hist * hist) @ rotations.T
+        best = acc.argmin(axis=1)
+        shifts.extend(best.tolist())
+        scores.extend(acc[np.arange(len(chunk)), best].tolist())
+    return shifts, scores
+
+
+def window_scores(
+    values: bytes,
+    window: int,
+    step: int = 1,
+    model: LanguageModel | None = None,
+) -> tuple[list[int], list[float]]:
+    # Best shift and its chi-square for each window of letter values (0-25)
+    # starting at 0, step, 2 * step, ...
+    if window < 1 or step < 1:
+        raise ValueError("window and step must be at least 1")
+    if len(values) < window:
+        return [], []
+    model = model or LANGUAGES["en"]
+    if np is not None and len(values) >= _NUMPY_MIN_LETTERS:
+        shifts, acc = _rolling_numpy(values, window, step, model)
+    else:
+        shifts, acc = _rolling_python(values, window, step, model)
+    # chi2 == acc / N - 2N + N * sum(f); reported per letter so windows compare.
+    offset = model.freq_sum - 2.0
+    return shifts, [a / (window * window) + offset for a in acc]
+
+
+def _letter_offsets(text: str | bytes, indices: list[int]) -> list[int]:
+    # Maps ascending letter indices to offsets in text in one pass over its letter runs.
+    pattern = _LETTER_RUN if isinstance(text, str) else _LETTER_RUN_BYTES
+    out = []
+    seen = 0
+    i = 0
+    for m in pattern.finditer(text):
+        if i == len(indices):
+            break
+        run = m.end() - m.start()
+        while i < len(indices) and indices[i] < seen + run:
+            out.append(m.start() + indices[i] - seen)
+            i += 1
+        seen += run
+    out.extend(repeat(len(text), len(indices) - i))
+    return out
+
+
+def _runs(shifts: list[int], scores: list[float], min_windows: int) -> list[list]:
+    runs: list[list] = []
+    for k, (shift, score) in enumerate(zip(shifts, scores)):
+        if runs and runs[-1][0] == shift:
+            run = runs[-1]
+            run[2] = k
+            run[3] += score
+            continue
+        runs.append([shift, k, k, score])
+
+    # Runs narrower than min_windows are noise at this resolution: fold them into
+    # the run before, then rejoin neighbours that now share a shift.
+    merged: list[list] = []
+    for run in runs:
+        if merged and (run[2] - run[1] + 1 < min_windows or run[0] == merged[-1][0]):
+            merged[-1][2] = run[2]
+            merged[-1][3] += run[3]
+        else:
+            merged.append(run)
+    return merged
+
+
+@timed("segments.segment_profile")
+def segment_profile(
+    text: str | bytes,
+    window: int = DEFAULT_WINDOW,
+    step: int | None = None,
+    language: str = "en",
+    min_windows: int | None = None,
+) -> SegmentProfile:
+    values = letter_values(text)
+    n = len(values)
+    window = min(window, n)
+    step = step or max(1, window // 8)
+    if n == 0:
+        return SegmentProfile(0, step, [], [], [], [])
+
+    shifts, scores = window_scores(values, window, step, LANGUAGES[language])
+    centers = [k * step + window // 2 for k in range(len(shifts))]
+    if min_windows is None:
+        min_windows = max(1, window // step)
+
+    runs = _runs(shifts, scores, min_windows)
+    bounds = [(centers[a[2]] + centers[b[1]]) // 2 for a, b in zip(runs, runs[1:])]
+    offsets = _letter_offsets(text, centers)
+    cuts = [0, *_letter_offsets(text, bounds), len(text)]
+    segments = [
+        Segment(cuts[i], cuts[i + 1], shift, total / (last - first + 1))
+        for i, (shift, first, last, total) in enumerate(runs)
+    ]
+    return SegmentProfile(window, step, offsets, shifts, scores, segments)
+
+
+def find_segments(
+    text: str | bytes,
+    window: int = DEFAULT_WINDOW,
+    step: int | None = None,
+    language: str = "en",
+) -> list[Segment]:
+    return segment_profile(text, window, step, language).segments
+
+
+__all__ = [
+    "DEFAULT_WINDOW",
+    "Segment",
+    "SegmentProfile",
+    "window_scores",
+    "segment_profile",
+    "find_segments",
+]
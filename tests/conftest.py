@@ -0,0 +1,37 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import ngrams  # noqa: E402
+
+# Written for these tests, so it is not part of the corpus the quadgram table
+# is trained on.
+ENGLISH = (
+    "On the first cold morning of the season the harbour was quiet, and the "
+    "fishing boats waited by the wall while their crews drank tea and argued "
+    "about the weather. Nobody wanted to be the first to leave. By noon the wind "
+    "had dropped, the clouds had broken into long grey bands, and a few of the "
+    "younger sailors began to carry nets down the steps. An old woman who sold "
+    "bread near the market told anyone who would listen that the storm was not "
+    "finished with them yet. Her brother had drowned in a calm like this one, she "
+    "said, many years before the new lighthouse was built on the northern point. "
+    "The children laughed at her stories, but their parents kept one eye on the "
+    "horizon all afternoon, and when the first heavy drops of rain began to fall "
+    "just before dusk, every boat was already safely back inside the harbour."
+)
+
+
+@pytest.fixture(autouse=True, scope="session")
+def quadgram_table_path(tmp_path_factory):
+    # Build the table once per run in a temporary directory, never in ~/.cache.
+    # CLI subprocesses inherit the variable.
+    path = str(tmp_path_factory.mktemp("quadgrams") / "quadgrams-en.f32")
+    os.environ[ngrams.QUADGRAM_ENV] = path
+    ngrams._table = ngrams._floor = None
+    yield path
+    ngrams._table = ngrams._floor = None
@@ -0,0 +1,65 @@
+import pytest
+
+from analysis import PREVIEW_CHARS, SCORERS, AnalysisState, shift_scores, top_k_shifts
+from cipher import ALPHABETS, LATIN, encrypt
+from conftest import ENGLISH
+
+
+PLAIN = ENGLISH
+
+
+@pytest.mark.parametrize("name, shift", [("ROT47", 20), ("ROT47", 77), ("ALNUM", 40)])
+def test_quadgram_ranks_mixed_alphabets(name, shift):
+    alphabet = ALPHABETS[name]
+    scores = shift_scores(encrypt(PLAIN, shift, alphabet), alphabet, "quadgram")
+    assert scores.index(min(scores)) == shift
+
+
+def test_candidates_carry_only_a_preview():
+    text = encrypt(PLAIN * 200, 7)
+    result = AnalysisState().analyze(text, 0, "decrypt", ((), "AND", False, False, False))
+
+    shift, _, _, preview = result["candidates"][0]
+    assert shift == 7
+    assert preview == (PLAIN * 200)[:PREVIEW_CHARS]
+
+
+@pytest.mark.parametrize("wrap", [bytes, memoryview, bytearray])
+def test_analyze_accepts_buffers(wrap):
+    crib = (("harbour",), "AND", False, False, False)
+    data = wrap(encrypt(PLAIN, 9).encode())
+
+    result = AnalysisState().analyze(data, 9, "decrypt", crib, timeline=True)
+
+    assert result["output"] == PLAIN
+    assert result["candidates"][0][0] == 9
+
+
+def test_analyze_blank_buffer():
+    result = AnalysisState().analyze(memoryview(b" \n\t"), 0, "decrypt", ((), "AND", False, False, False))
+    assert result["candidates"] == []
+
+
+def _full_ranking(text, scorer, k):
+    scores = shift_scores(text, LATIN, scorer)
+    return sorted(range(26), key=scores.__getitem__)[:k]
+
+
+@pytest.mark.parametrize("scorer", SCORERS)
+@pytest.mark.parametrize("k", [1, 3])
+def test_top_k_matches_full_ranking_with_misleading_prefix(scorer, k):
+    # A plain prefix followed by a long body at another shift: the body decides.
+    body = (ENGLISH + " ") * 600
+    text = body[:20_000] + encrypt(body, 7)
+
+    ranked = top_k_shifts(text, k, scorer=scorer)
+
+    assert [s for s, _ in ranked] == _full_ranking(text, scorer, k)
+    assert ranked[0][1] == pytest.approx(shift_scores(text, LATIN, scorer)[7])
+
+
+@pytest.mark.parametrize("scorer", SCORERS)
+def test_top_k_respects_eligible(scorer):
+    text = encrypt((ENGLISH + " ") * 100, 11)
+    ranked = top_k_shifts(text, 2, scorer=scorer, eligible=lambda s: s != 11)
+    assert [s for s, _ in ranked] == [s for s in _full_ranking(text, scorer, 3) if s != 11][:2]
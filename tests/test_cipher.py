@@ -0,0 +1,49 @@
+import mmap
+
+import pytest
+
+from cipher import ALNUM, ROT5, ROT47, Alphabet, caesar, decrypt, encrypt
+
+
+def test_caesar_reads_mmap_in_place(tmp_path):
+    path = tmp_path / "cipher.bin"
+    path.write_bytes(encrypt("Attack at dawn", 3).encode() + b"\xff")
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        assert caesar(mm, 3, decrypt=True) == bytearray(b"Attack at dawn\xff")
+
+
+def test_rot47_is_its_own_inverse():
+    text = "Meet at 10:45 near the {north} gate!"
+    once = encrypt(text, 47, ROT47)
+
+    assert once == "|66E 2E `_icd ?62C E96 L?@CE9N 82E6P"
+    assert encrypt(once, 47, ROT47) == text
+
+
+def test_rot5_only_moves_digits():
+    assert encrypt("Room 1290, floor 7", 5, ROT5) == "Room 6745, floor 2"
+
+
+@pytest.mark.parametrize("alphabet", [ROT47, ROT5, ALNUM])
+@pytest.mark.parametrize("shift", [1, 13, 61, -4])
+def test_round_trip_keeps_other_characters(alphabet, shift):
+    text = "Caf\u00e9 No. 42 \u2013 open\tdaily_until 9pm; \u00fcber \U0001f600!"
+    out = encrypt(text, shift, alphabet)
+
+    assert decrypt(out, shift, alphabet) == text
+    assert caesar(text.encode(), shift, alphabet=alphabet) == out.encode()
+    for before, after in zip(text, out):
+        if before not in alphabet.chars:
+            assert after == before
+
+
+def test_alnum_wraps_across_digits_and_cases():
+    assert encrypt("9Zz", 1, ALNUM) == "Aa0"
+
+
+def test_custom_alphabet_rejects_bad_segments():
+    with pytest.raises(ValueError):
+        Alphabet("bad", "abc", "de")
+    with pytest.raises(ValueError):
+        Alphabet("dup", "aba")
@@ -0,0 +1,57 @@
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+
+from cipher import encrypt
+from conftest import ROOT
+
+
+SAMPLE = "the quick brown fox jumps over the lazy dog while people were reading {}"
+
+
+def run_cli(*args, env=None):
+    proc = subprocess.run(
+        [sys.executable, os.path.join(ROOT, "cli.py"), *args],
+        capture_output=True,
+        env={**os.environ, **(env or {})},
+        cwd=ROOT,
+    )
+    return proc.returncode, proc.stdout, proc.stderr
+
+
+def test_worker_results_reach_disk_cache(tmp_path):
+    src = tmp_path / "many.txt"
+    src.write_text("\n".join(encrypt(SAMPLE.format(i), i % 26) for i in range(40)), encoding="utf-8")
+    db = tmp_path / "cache.db"
+
+    code, out, _ = run_cli("--lines", "-j", "2", "--cache", str(db), str(src))
+
+    assert code == 0
+    assert len(out.splitlines()) == 40
+    with sqlite3.connect(db) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM results").fetchone()[0] == 40
+
+
+def test_binary_plaintext_is_valid_json(tmp_path):
+    src = tmp_path / "bin.txt"
+    src.write_bytes(encrypt("attack the northern gate ", 3).encode() + b"\xff\xfe at dawn\n")
+
+    code, out, _ = run_cli("--plaintext", str(src), env={"PYTHONIOENCODING": "utf-8"})
+
+    assert code == 0
+    assert "plaintext" in json.loads(out.decode("utf-8"))
+
+
+def test_missing_input_reports_error_and_continues(tmp_path):
+    src = tmp_path / "one.txt"
+    src.write_text(encrypt(SAMPLE.format(1), 5), encoding="utf-8")
+    missing = tmp_path / "missing.txt"
+
+    code, out, _ = run_cli(str(missing), str(src))
+
+    assert code == 0
+    first, second = map(json.loads, out.splitlines())
+    assert first["source"] == str(missing) and "error" in first
+    assert second["shift"] == 5
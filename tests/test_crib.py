@@ -0,0 +1,86 @@
+import random
+
+import pytest
+
+from cipher import decrypt, encrypt
+import crib
+from crib import _AUTOMATON_MIN_HINTS, build_matcher, clear_matcher_cache, matching_shifts
+
+
+# Letters, word characters and the non-ASCII characters that lower() folds into
+# ASCII letters (KELVIN SIGN, LATIN CAPITAL LETTER I WITH DOT ABOVE).
+_CHARS = "abcdeKIkiXYZ _-.,Kİßé"
+
+
+def _random_case(rng):
+    text = "".join(rng.choice(_CHARS) for _ in range(rng.randint(0, 40)))
+    hints = []
+    for _ in range(rng.randint(1, 3)):
+        if text and rng.random() < 0.7:
+            # Mostly pieces of some decryption, so the matchers disagree if
+            # either one misses a real match.
+            plain = decrypt(text, rng.randrange(26))
+            start = rng.randrange(len(plain))
+            hint = plain[start:start + rng.randint(1, 4)]
+        else:
+            hint = "".join(rng.choice(_CHARS) for _ in range(rng.randint(1, 3)))
+        if hint.strip():
+            hints.append(hint)
+    return text, hints or ["a"]
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_matching_shifts_agrees_with_plaintext_matcher(seed):
+    rng = random.Random(seed)
+    for _ in range(1000):
+        text, hints = _random_case(rng)
+        mode = rng.choice(["AND", "OR"])
+        ignore_case = rng.random() < 0.5
+        word_boundary = rng.random() < 0.3
+
+        found = matching_shifts(text, hints, mode, ignore_case, word_boundary)
+        matcher, _ = build_matcher(hints, mode, ignore_case, False, word_boundary)
+        expected = [matcher(decrypt(text, k)) for k in range(26)]
+        if found is not None:
+            assert found == expected, (text, hints, mode, ignore_case, word_boundary)
+
+
+def _many_hints(rng, text, count):
+    # Half are pieces of text, half random words that are almost never there.
+    hints = []
+    for _ in range(count):
+        if rng.random() < 0.5:
+            start = rng.randrange(len(text) - 8)
+            hints.append(text[start:start + rng.randint(3, 8)])
+        else:
+            hints.append("".join(rng.choice("qxzjvk") for _ in range(6)))
+    return hints
+
+
+@pytest.mark.parametrize("budget", [0, 1, crib._SCAN_BUDGET])
+@pytest.mark.parametrize("mode", ["AND", "OR"])
+def test_many_hints_agree_with_substring_loop(monkeypatch, budget, mode):
+    # Budget 0 hands every decision to the automaton; the default mixes both.
+    monkeypatch.setattr(crib, "_SCAN_BUDGET", budget)
+    clear_matcher_cache()
+    rng = random.Random(budget)
+    text = "the harbour was quiet and the fishing boats waited by the wall " * 20
+    agg = all if mode == "AND" else any
+    for _ in range(20):
+        count = _AUTOMATON_MIN_HINTS + rng.randrange(40)
+        hints = _many_hints(rng, text, count)
+        if mode == "AND" and rng.random() < 0.7:
+            hints = ([h for h in hints if h in text] * 4)[:count]
+        probe = text[: rng.randrange(len(text))]
+
+        matcher, _ = build_matcher(hints, mode, False, False, False)
+        assert matcher(probe) == agg(h in probe for h in hints)
+
+        cipher = encrypt(probe, 5)
+        expected = [agg(h in decrypt(cipher, k) for h in hints) for k in range(26)]
+        assert matching_shifts(cipher, hints, mode, False, False) == expected
+
+
+def test_ignore_case_keeps_fast_path_for_other_non_ascii():
+    assert matching_shifts("Grüße 🎉 khoor", ["hello"], "AND", True, False)[3]
+    assert matching_shifts("\u212a khoor", ["hello"], "AND", True, False) is None
@@ -0,0 +1,46 @@
+import pytest
+
+from analysis import AnalysisState
+from cipher import encrypt
+from conftest import ENGLISH
+from scoring import LANGUAGES, chi_square_scores, language_scores, letter_counts_az
+
+
+# Short passages written for these tests.
+SAMPLES = {
+    "en": ENGLISH,
+    "de": (
+        "Am Abend kamen die Nachbarn zusammen, um über den neuen Weg am Fluss zu "
+        "sprechen. Einige wollten die alten Bäume stehen lassen, andere meinten, "
+        "dass die Kinder einen sicheren Weg zur Schule brauchen. Der Bürgermeister "
+        "hörte lange zu und versprach, dass im Frühling gemeinsam entschieden wird."
+    ),
+    "fr": (
+        "Le matin, la boulangerie du village ouvre avant le lever du soleil, et "
+        "les premiers clients attendent devant la porte en parlant de la pluie. "
+        "Quand le pain sort du four, toute la rue sent la farine chaude, et même "
+        "les enfants qui vont à l'école ralentissent pour regarder les vitrines."
+    ),
+    "es": (
+        "Cuando llegamos a la estación ya era de noche y no quedaba ningún tren "
+        "hacia la costa, así que buscamos una pensión pequeña cerca de la plaza. "
+        "La dueña nos preparó una sopa caliente y nos contó historias de su "
+        "familia, que había vivido en aquella casa durante más de cien años."
+    ),
+}
+CRIB = ((), "AND", False, False, False)
+
+
+@pytest.mark.parametrize("code", sorted(SAMPLES))
+def test_auto_detects_language_and_shift(code):
+    state = AnalysisState(languages=tuple(LANGUAGES))
+    result = state.analyze(encrypt(SAMPLES[code], 6), 6, "decrypt", CRIB)
+
+    assert result["candidates"][0][0] == 6
+    assert result["languages"][0] == code
+    assert result["language"] == code
+
+
+def test_english_language_scores_match_chi_square():
+    counts, total = letter_counts_az(encrypt(ENGLISH, 3))
+    assert language_scores(counts, total, ("en",))["en"] == pytest.approx(chi_square_scores(counts, total))
@@ -0,0 +1,28 @@
+import os
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+import ngrams
+from ngrams import TABLE_SIZE, load_table, save_table
+
+
+def test_concurrent_saves_leave_one_table(tmp_path):
+    path = str(tmp_path / "quadgrams.f32")
+    table = array("f", bytes(4 * TABLE_SIZE))
+
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda _: save_table(table, path), range(16)))
+
+    assert os.listdir(tmp_path) == ["quadgrams.f32"]
+    assert len(load_table(path)) == TABLE_SIZE
+
+
+def test_unwritable_table_path_falls_back_to_memory(tmp_path, monkeypatch):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    monkeypatch.setenv(ngrams.QUADGRAM_ENV, str(blocker / "sub" / "quadgrams.f32"))
+    monkeypatch.setattr(ngrams, "_table", None)
+    monkeypatch.setattr(ngrams, "_floor", None)
+
+    assert len(ngrams.quadgram_table()) == TABLE_SIZE
+    assert ngrams.quadgram_score("the quick brown fox") < ngrams.quadgram_score("xqzj vkwp qzxj fjqk")
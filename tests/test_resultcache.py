@@ -0,0 +1,58 @@
+from cipher import LATIN
+from conftest import ENGLISH
+from resultcache import CachedResult, ResultCache
+from scoring import Histogram
+
+
+def entry_for(text, shift=0):
+    hist = Histogram.from_text(text)
+    return CachedResult(hist, hist.chi_square_scores(), shift)
+
+
+def test_memory_keeps_most_recent_entries():
+    cache = ResultCache(max_entries=2)
+    keys = [cache.key(str(i), LATIN, "chi2") for i in range(3)]
+    cache.put(keys[0], entry_for("a"))
+    cache.put(keys[1], entry_for("b"))
+    assert cache.get(keys[0]) is not None
+    cache.put(keys[2], entry_for("c"))
+
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None and cache.get(keys[2]) is not None
+    assert cache.info()["entries"] == 2
+
+
+def test_entries_survive_reopening(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = ResultCache(path)
+    key = b"k" * 32
+    stored = entry_for(ENGLISH, 7)
+    cache.put(key, stored)
+    cache.close()
+
+    reopened = ResultCache(path)
+    loaded = reopened.get(key)
+    reopened.close()
+
+    assert reopened.disk_hits == 1
+    assert loaded.hist == stored.hist and loaded.hist.total == stored.hist.total
+    assert loaded.scores == stored.scores
+    assert loaded.shift == 7
+
+
+def test_disk_stays_under_limit(tmp_path):
+    path = str(tmp_path / "cache.db")
+    entry = entry_for(ENGLISH)
+    row = 32 + len(entry.hist.counts.tobytes()) + len(entry.scores.tobytes())
+    cache = ResultCache(path, max_bytes=10 * row)
+    for i in range(50):
+        cache.put(i.to_bytes(32, "big"), entry)
+    cache.close()
+
+    reopened = ResultCache(path, max_bytes=10 * row)
+    size = reopened.info()["disk_bytes"]
+    rows = reopened._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+    reopened.close()
+
+    assert 0 < size <= 10 * row
+    assert 0 < rows <= 10
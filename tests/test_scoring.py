@@ -0,0 +1,60 @@
+import math
+from array import array
+
+import pytest
+
+from cipher import encrypt
+from conftest import ENGLISH
+from scoring import Histogram, chi_square_score, chi_square_scores, confidence_inplace, confidence_percent
+
+
+def naive_counts(text):
+    return [sum(ch.lower() == letter for ch in text) for letter in "abcdefghijklmnopqrstuvwxyz"]
+
+
+@pytest.mark.parametrize("text", ["", "Zebra!", ENGLISH[:200], ENGLISH * 3, "naïve café K"])
+def test_histogram_counts_ascii_letters(text):
+    expected = naive_counts(text.encode("ascii", "ignore").decode())
+    hist = Histogram.from_text(text)
+
+    assert hist.tolist() == expected
+    assert hist.total == sum(expected)
+    assert Histogram.from_text(text.encode()) == hist
+    assert Histogram.from_text(memoryview(text.encode())) == hist
+
+
+def test_histogram_merge_subtract_and_rotate():
+    left, right = ENGLISH[:300], ENGLISH[300:]
+    whole = Histogram.from_text(ENGLISH)
+    merged = Histogram.from_text(left).merge(Histogram.from_text(right))
+
+    assert merged == whole and merged.total == whole.total
+    assert merged.subtract(Histogram.from_text(right)) == Histogram.from_text(left)
+    assert whole.rotated(5) == Histogram.from_text(encrypt(ENGLISH, -5))
+    with pytest.raises(ValueError):
+        Histogram.from_text("a").subtract(Histogram.from_text("b"))
+
+
+def test_histogram_scores_match_list_scores():
+    hist = Histogram.from_text(encrypt(ENGLISH, 9))
+    out = array("d", [0.0]) * 26
+
+    assert hist.chi_square_scores(out) is out
+    assert list(out) == pytest.approx(chi_square_scores(hist.tolist(), hist.total))
+    assert out[9] == pytest.approx(chi_square_score(ENGLISH))
+    assert min(range(26), key=out.__getitem__) == 9
+    assert list(Histogram().chi_square_scores()) == [math.inf] * 26
+
+
+@pytest.mark.parametrize("scores", [
+    [3.0, 1.0, math.inf, 2.0],
+    [4.0, 4.0, 4.0],
+    [math.inf, math.inf],
+])
+def test_confidence_inplace_matches_percent(scores):
+    buf = array("d", scores)
+    expected = confidence_percent(scores)
+
+    assert confidence_inplace(buf) is buf
+    assert list(buf) == pytest.approx(expected)
+    assert buf[scores.index(min(scores))] == max(buf)
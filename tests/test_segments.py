@@ -0,0 +1,40 @@
+import pytest
+
+import segments
+from cipher import encrypt
+from conftest import ENGLISH
+from segments import segment_profile
+
+
+SHIFTS = (3, 11, 20)
+PARTS = [encrypt(ENGLISH + " " + ENGLISH, shift) for shift in SHIFTS]
+MIXED = " ".join(PARTS)
+
+
+def test_profile_finds_each_shifted_section():
+    profile = segment_profile(MIXED)
+
+    assert [seg.shift for seg in profile.segments] == list(SHIFTS)
+    assert profile.segments[0].start == 0 and profile.segments[-1].end == len(MIXED)
+    boundary = len(PARTS[0])
+    assert abs(profile.segments[1].start - boundary) < profile.window
+    for left, right in zip(profile.segments, profile.segments[1:]):
+        assert left.end == right.start
+
+
+def test_bytes_profile_matches_str():
+    text = segment_profile(MIXED)
+    data = segment_profile(MIXED.encode())
+
+    assert [(s.start, s.end, s.shift) for s in data.segments] == [(s.start, s.end, s.shift) for s in text.segments]
+
+
+@pytest.mark.skipif(segments.np is None, reason="needs numpy")
+def test_numpy_and_python_windows_agree(monkeypatch):
+    monkeypatch.setattr(segments, "_NUMPY_MIN_LETTERS", 0)
+    fast = segment_profile(MIXED, step=7)
+    monkeypatch.setattr(segments, "_NUMPY_MIN_LETTERS", float("inf"))
+    slow = segment_profile(MIXED, step=7)
+
+    assert fast.shifts == slow.shifts
+    assert fast.scores == pytest.approx(slow.scores)
@@ -0,0 +1,17 @@
+import vigenere
+from test_analysis import PLAIN
+
+
+def test_crack_evaluates_a_bounded_prefix(monkeypatch):
+    seen = []
+    evaluate = vigenere.evaluate_periods
+
+    def spy(values, periods):
+        seen.append(len(values))
+        return evaluate(values, periods)
+
+    monkeypatch.setattr(vigenere, "evaluate_periods", spy)
+    text = vigenere.vigenere(PLAIN * 2000, "LEMON")
+
+    assert [key for key, _ in vigenere.crack(text)] == ["LEMON"]
+    assert seen == [vigenere._CRACK_LETTERS]
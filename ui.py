@@ -1,11 +1,36 @@
+import binascii
+import os
+from concurrent.futures import ThreadPoolExecutor
+
 import customtkinter as ctk
 
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+import perf
+from cipher import ALPHABETS
+from crib import parse_hints
+from resultcache import default_cache
+from analysis import VIGENERE, AnalysisState
+from scoring import LANGUAGES
+
+
+# Outputs longer than this are rendered as a movable window instead of in full.
+_OUTPUT_WINDOW_CHARS = 1 << 16
+_OUTPUT_STEP_CHARS = 1 << 11
+_PREVIEW_CHARS = 1 << 16
+_CLIPBOARD_CHUNK = 1 << 20
+INPUT_FORMATS = ("text", "hex", "base64")
+
+
+def _read_text(path: str) -> str:
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return f.read()
+
 
-from cipher import encrypt, decrypt
-from scoring import chi_square_score, confidence_percent, letter_counts_az
-from crib import parse_hints, build_matcher
-from viz import build_frequency_figure, update_frequency_axes
+def _decode_input(raw: str, fmt: str) -> str | bytes:
+    if fmt == "hex":
+        return bytes.fromhex(raw)
+    if fmt == "base64":
+        return binascii.a2b_base64(raw)
+    return raw
 
 
 class ShiftSleuthApp(ctk.CTk):
@@ -19,10 +44,34 @@ class ShiftSleuthApp(ctk.CTk):
         ctk.set_default_color_theme("blue")
 
         self._debounce_job = None
-
-        self._fig = None
-        self._ax = None
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._generation = 0
+        self._analysis_future = None
+        self._state = AnalysisState(cache=default_cache())
+
+        self._cand_rows = []
+        self._cand_shifts = []
+        self._cand_visible = 0
+        self._cand_message = None
+        self._map_rows = []
+        self._map_header = None
+        self._map_visible = 0
+        self._map_key = None
+
+        self._chart = None
         self._canvas = None
+        self._timeline = None
+        self._timeline_canvas = None
+
+        self._large_text = None
+        self._output_text = ""
+        self._output_view = None
+        self._output_pos = 0
+        self._decoded_input = None
+
+        self._perf_overlay = None
+        self._perf_label = None
+        self._perf_visible = False
 
         self.grid_rowconfigure(1, weight=3)
         self.grid_rowconfigure(2, weight=2)
@@ -38,29 +87,36 @@ class ShiftSleuthApp(ctk.CTk):
     def _build_topbar(self):
         top = ctk.CTkFrame(self, corner_radius=12)
         top.grid(row=0, column=0, sticky="ew", padx=12, pady=(12, 8))
-        top.grid_columnconfigure(3, weight=1)
+        top.grid_columnconfigure(5, weight=1)
 
         ctk.CTkLabel(top, text="Mode").grid(row=0, column=0, padx=(12, 6), pady=12, sticky="w")
-        self.mode_seg = ctk.CTkSegmentedButton(top, values=["decrypt", "encrypt"])
+        self.mode_seg = ctk.CTkSegmentedButton(top, values=["decrypt", "encrypt", VIGENERE])
         self.mode_seg.set("decrypt")
         self.mode_seg.grid(row=0, column=1, padx=6, pady=12, sticky="w")
 
-        ctk.CTkLabel(top, text="Shift").grid(row=0, column=2, padx=(18, 6), pady=12, sticky="w")
+        self.key_entry = ctk.CTkEntry(top, placeholder_text="key", width=90)
+        self.key_entry.grid(row=0, column=2, padx=6, pady=12, sticky="w")
+
+        self.alphabet_menu = ctk.CTkOptionMenu(top, values=list(ALPHABETS), width=96)
+        self.alphabet_menu.set("A-Z")
+        self.alphabet_menu.grid(row=0, column=3, padx=6, pady=12, sticky="w")
+
+        ctk.CTkLabel(top, text="Shift").grid(row=0, column=4, padx=(18, 6), pady=12, sticky="w")
         self.shift_slider = ctk.CTkSlider(top, from_=0, to=25, number_of_steps=25)
         self.shift_slider.set(3)
-        self.shift_slider.grid(row=0, column=3, padx=6, pady=12, sticky="ew")
+        self.shift_slider.grid(row=0, column=5, padx=6, pady=12, sticky="ew")
 
         self.shift_value = ctk.CTkLabel(top, text="3", width=36)
-        self.shift_value.grid(row=0, column=4, padx=(6, 12), pady=12, sticky="e")
+        self.shift_value.grid(row=0, column=6, padx=(6, 12), pady=12, sticky="e")
 
         self.btn_recommend = ctk.CTkButton(top, text="Recommend", width=120)
-        self.btn_recommend.grid(row=0, column=5, padx=(6, 6), pady=12)
+        self.btn_recommend.grid(row=0, column=7, padx=(6, 6), pady=12)
 
         self.btn_copy = ctk.CTkButton(top, text="Copy Output", width=120)
-        self.btn_copy.grid(row=0, column=6, padx=6, pady=12)
+        self.btn_copy.grid(row=0, column=8, padx=6, pady=12)
 
         self.btn_clear = ctk.CTkButton(top, text="Clear", width=90)
-        self.btn_clear.grid(row=0, column=7, padx=(6, 12), pady=12)
+        self.btn_clear.grid(row=0, column=9, padx=(6, 12), pady=12)
 
     def _build_main(self):
         main = ctk.CTkFrame(self, corner_radius=12)
@@ -75,14 +131,25 @@ class ShiftSleuthApp(ctk.CTk):
         left.grid_rowconfigure(3, weight=1)
         left.grid_columnconfigure(0, weight=1)
 
-        ctk.CTkLabel(left, text="Input").grid(row=0, column=0, sticky="w", padx=12, pady=(12, 6))
+        in_head = ctk.CTkFrame(left, fg_color="transparent")
+        in_head.grid(row=0, column=0, columnspan=2, sticky="ew", padx=12, pady=(12, 6))
+        ctk.CTkLabel(in_head, text="Input").pack(side="left")
+        self.format_seg = ctk.CTkSegmentedButton(in_head, values=list(INPUT_FORMATS))
+        self.format_seg.set("text")
+        self.format_seg.pack(side="left", padx=8)
+        self.btn_open = ctk.CTkButton(in_head, text="Open File…", width=100)
+        self.btn_open.pack(side="right")
+        self.input_info = ctk.CTkLabel(in_head, text="", text_color=("gray40", "gray70"))
+        self.input_info.pack(side="right", padx=8)
+
         self.input_box = ctk.CTkTextbox(left, wrap="word")
-        self.input_box.grid(row=1, column=0, sticky="nsew", padx=12, pady=(0, 10))
+        self.input_box.grid(row=1, column=0, columnspan=2, sticky="nsew", padx=12, pady=(0, 10))
 
         ctk.CTkLabel(left, text="Output").grid(row=2, column=0, sticky="w", padx=12, pady=(4, 6))
         self.output_box = ctk.CTkTextbox(left, wrap="word")
-        self.output_box.grid(row=3, column=0, sticky="nsew", padx=12, pady=(0, 12))
+        self.output_box.grid(row=3, column=0, sticky="nsew", padx=(12, 0), pady=(0, 12))
         self.output_box.configure(state="disabled")
+        self.output_scroll = ctk.CTkScrollbar(left, command=self._on_output_scroll)
 
         right = ctk.CTkFrame(main, corner_radius=12)
         right.grid(row=0, column=1, sticky="nsew", padx=(6, 10), pady=10)
@@ -109,7 +176,16 @@ class ShiftSleuthApp(ctk.CTk):
         self.boundary_switch = ctk.CTkSwitch(toggles, text="Word boundary")
         self.boundary_switch.pack(side="left")
 
-        ctk.CTkLabel(right, text="Top Candidates").grid(row=3, column=0, sticky="w", padx=12, pady=(8, 6))
+        cand_head = ctk.CTkFrame(right, fg_color="transparent")
+        cand_head.grid(row=3, column=0, sticky="ew", padx=12, pady=(8, 6))
+        ctk.CTkLabel(cand_head, text="Top Candidates").pack(side="left")
+
+        self.scorer_seg = ctk.CTkSegmentedButton(cand_head, values=["chi2", "quadgram"], width=160)
+        self.scorer_seg.set("chi2")
+        self.scorer_seg.pack(side="right")
+        self.language_menu = ctk.CTkOptionMenu(cand_head, values=[*LANGUAGES, "auto"], width=80)
+        self.language_menu.set("en")
+        self.language_menu.pack(side="right", padx=(0, 8))
         self.cand_frame = ctk.CTkScrollableFrame(right, height=220)
         self.cand_frame.grid(row=4, column=0, sticky="nsew", padx=12, pady=(0, 12))
 
@@ -125,7 +201,12 @@ class ShiftSleuthApp(ctk.CTk):
         chart.grid_rowconfigure(1, weight=1)
         chart.grid_columnconfigure(0, weight=1)
 
-        ctk.CTkLabel(chart, text="Frequency Chart").grid(row=0, column=0, sticky="w", padx=12, pady=(12, 6))
+        chart_head = ctk.CTkFrame(chart, fg_color="transparent")
+        chart_head.grid(row=0, column=0, sticky="ew", padx=12, pady=(12, 6))
+        ctk.CTkLabel(chart_head, text="Frequency Chart").pack(side="left")
+        self.chart_view_seg = ctk.CTkSegmentedButton(chart_head, values=["frequency", "timeline"], width=160)
+        self.chart_view_seg.set("frequency")
+        self.chart_view_seg.pack(side="right")
         self.chart_host = ctk.CTkFrame(chart, corner_radius=10)
         self.chart_host.grid(row=1, column=0, sticky="nsew", padx=12, pady=(0, 12))
 
@@ -153,6 +234,9 @@ class ShiftSleuthApp(ctk.CTk):
     def _wire_events(self):
         self.input_box.bind("<KeyRelease>", lambda _e: self.schedule_update())
         self.mode_seg.configure(command=lambda _v: self.schedule_update())
+        self.format_seg.configure(command=lambda _v: self.schedule_update())
+        self.key_entry.bind("<KeyRelease>", lambda _e: self.schedule_update())
+        self.alphabet_menu.configure(command=lambda _v: self.on_alphabet_change())
         self.shift_slider.configure(command=lambda _v: self.on_shift_change())
 
         self.crib_entry.bind("<KeyRelease>", lambda _e: self.schedule_update())
@@ -162,11 +246,16 @@ class ShiftSleuthApp(ctk.CTk):
         self.boundary_switch.configure(command=self.schedule_update)
 
         self.map_mode_seg.configure(command=lambda _v: self.schedule_update())
+        self.scorer_seg.configure(command=lambda _v: self.schedule_update())
+        self.language_menu.configure(command=lambda _v: self.schedule_update())
+        self.chart_view_seg.configure(command=lambda _v: self.schedule_update())
 
+        self.btn_open.configure(command=self.open_file)
         self.btn_copy.configure(command=self.copy_output)
         self.btn_clear.configure(command=self.clear_all)
         self.btn_recommend.configure(command=self.recommend_best)
         self.btn_copy_map.configure(command=self.copy_mapping)
+        self.bind("<F12>", self.toggle_perf_overlay)
 
     def schedule_update(self, *_args):
         if self._debounce_job is not None:
@@ -178,67 +267,235 @@ class ShiftSleuthApp(ctk.CTk):
         self.shift_value.configure(text=str(shift))
         self.schedule_update()
 
+    def alphabet(self):
+        return ALPHABETS[self.alphabet_menu.get()]
+
+    def languages(self) -> tuple[str, ...]:
+        choice = self.language_menu.get()
+        return tuple(LANGUAGES) if choice == "auto" else (choice,)
+
+    def on_alphabet_change(self):
+        top = self.alphabet().size - 1
+        shift = min(int(round(self.shift_slider.get())), top)
+        self.shift_slider.configure(to=top, number_of_steps=top)
+        self.shift_slider.set(shift)
+        self.shift_value.configure(text=str(shift))
+        self.schedule_update()
+
     def get_input_text(self) -> str:
+        if self._large_text is not None:
+            return self._large_text
         return self.input_box.get("1.0", "end-1c")
 
-    def set_output_text(self, text: str):
+    def _payload(self, raw: str, fmt: str) -> str | bytes:
+        # hex/base64 input is decoded straight to bytes and analysed as such.
+        if fmt == "text":
+            return raw
+        cached = self._decoded_input
+        if cached is not None and cached[0] == fmt and cached[1] == raw:
+            return cached[2]
+        data = _decode_input(raw, fmt)
+        self._decoded_input = (fmt, raw, data)
+        return data
+
+    def open_file(self):
+        from tkinter import filedialog
+
+        path = filedialog.askopenfilename(parent=self, title="Open ciphertext")
+        if not path:
+            return
+        future = self._executor.submit(_read_text, path)
+        self.after(10, self._poll_future, None, future, lambda text: self.load_large_text(path, text))
+
+    def load_large_text(self, path: str, text: str):
+        self._large_text = text
+        preview = text[:_PREVIEW_CHARS]
+        if len(text) > _PREVIEW_CHARS:
+            preview += "\n\n[… preview only — the full file is analysed]"
+        self.input_box.configure(state="normal")
+        self.input_box.delete("1.0", "end")
+        self.input_box.insert("1.0", preview)
+        self.input_box.configure(state="disabled")
+        self.input_info.configure(text=f"{os.path.basename(path)} · {len(text):,} chars")
+        self.update_all()
+
+    def _render_output(self, view: str):
+        if view is self._output_view or view == self._output_view:
+            return
+        self._output_view = view
         self.output_box.configure(state="normal")
         self.output_box.delete("1.0", "end")
-        self.output_box.insert("1.0", text)
+        self.output_box.insert("1.0", view)
         self.output_box.configure(state="disabled")
 
-    def update_all(self):
-        self._debounce_job = None
-        self.update_output()
-        self.update_candidates()
-        self.update_chart()
-        self.update_mapping()
-
-    def update_output(self):
-        text = self.get_input_text()
-        if not text.strip():
-            self.set_output_text("")
+    def set_output_text(self, text: str):
+        self._output_text = text
+        if len(text) <= _OUTPUT_WINDOW_CHARS:
+            self._output_pos = 0
+            self.output_scroll.grid_remove()
+            self._render_output(text)
+            return
+        self.output_scroll.grid(row=3, column=1, sticky="ns", padx=(2, 12), pady=(0, 12))
+        self._move_output(self._output_pos)
+
+    def _move_output(self, pos: int):
+        text = self._output_text
+        pos = max(0, min(pos, len(text) - _OUTPUT_WINDOW_CHARS))
+        if pos:
+            line_start = text.rfind("\n", max(0, pos - _OUTPUT_STEP_CHARS), pos)
+            if line_start >= 0:
+                pos = line_start + 1
+        self._output_pos = pos
+        end = min(len(text), pos + _OUTPUT_WINDOW_CHARS)
+        self._render_output(text[pos:end])
+        self.output_scroll.set(pos / len(text), end / len(text))
+
+    def _on_output_scroll(self, action: str, amount: str, unit: str = "units"):
+        if len(self._output_text) <= _OUTPUT_WINDOW_CHARS:
+            return
+        if action == "moveto":
+            self._move_output(int(float(amount) * len(self._output_text)))
+            return
+        step = _OUTPUT_WINDOW_CHARS // 2 if unit == "pages" else _OUTPUT_STEP_CHARS
+        self._move_output(self._output_pos + int(amount) * step)
+
+    def crib_settings(self) -> tuple:
+        return (
+            tuple(parse_hints(self.crib_entry.get())),
+            self.andor_seg.get(),
+            bool(self.case_switch.get()),
+            bool(self.regex_switch.get()),
+            bool(self.boundary_switch.get()),
+        )
+
+    def run_in_background(self, fn, on_done, *args, **kwargs):
+        gen = self._generation
+        future = self._executor.submit(fn, *args, **kwargs)
+        self.after(10, self._poll_future, gen, future, on_done)
+        return future
+
+    def _poll_future(self, gen: int, future, on_done):
+        if not future.done():
+            self.after(15, self._poll_future, gen, future, on_done)
+            return
+        if gen is not None and gen != self._generation:
             return
-
-        shift = int(round(self.shift_slider.get()))
-        mode = self.mode_seg.get()
-
         try:
-            out = decrypt(text, shift) if mode == "decrypt" else encrypt(text, shift)
+            result = future.result()
         except Exception as e:
-            out = f"[Error] {e}"
+            # Raised inside an after() callback it would vanish and leave the
+            # panels stale, so show it where input errors go.
+            self.show_error(f"[Error] {e}")
+            return
+        on_done(result)
 
-        self.set_output_text(out)
+    def show_error(self, message: str):
+        self.set_output_text(message)
+        self._clear_candidates()
+        self._show_candidate_message(message)
 
-    def get_selected_text(self) -> str:
-        text = self.get_input_text()
-        if not text.strip():
-            return ""
+    def update_all(self):
+        self._debounce_job = None
+        self._generation += 1
         shift = int(round(self.shift_slider.get()))
-        mode = self.mode_seg.get()
+        with perf.span("ui.update_mapping"):
+            self.update_mapping()
+        if self._analysis_future is not None:
+            self._analysis_future.cancel()
+        self._analysis_future = self.run_in_background(
+            self._analyze,
+            self.apply_analysis,
+            self.get_input_text(),
+            self.format_seg.get(),
+            shift,
+            self.mode_seg.get(),
+            self.crib_settings(),
+            alphabet=self.alphabet(),
+            scorer=self.scorer_seg.get(),
+            key=self.key_entry.get().strip(),
+            languages=self.languages(),
+            timeline=self.chart_view_seg.get() == "timeline",
+        )
+
+    def _analyze(self, raw: str, fmt: str, *args, **kwargs) -> dict:
+        with perf.span("ui.analyze"):
+            try:
+                data = self._payload(raw, fmt)
+            except ValueError as e:
+                result = self._state.analyze("", *args, **kwargs)
+                result["output"] = result["message"] = f"[Error] invalid {fmt} input: {e}"
+                return result
+            return self._state.analyze(data, *args, **kwargs)
+
+    def _top_k(self, raw: str, fmt: str, *args, **kwargs):
         try:
-            return decrypt(text, shift) if mode == "decrypt" else encrypt(text, shift)
-        except Exception:
-            return ""
+            data = self._payload(raw, fmt)
+        except ValueError as e:
+            return [], str(e)
+        return self._state.top_k(data, *args, **kwargs)
+
+    def apply_analysis(self, result: dict):
+        with perf.span("ui.update_output"):
+            self.update_output(result)
+        with perf.span("ui.update_candidates"):
+            self.update_candidates(result)
+        with perf.span("ui.update_chart"):
+            self.update_chart(result)
+
+    def update_output(self, result: dict):
+        self.set_output_text(result["output"])
 
     def init_chart_if_needed(self):
         if self._canvas is not None:
             return
-        fig, ax = build_frequency_figure("", "")
-        self._fig = fig
-        self._ax = ax
-        canvas = FigureCanvasTkAgg(fig, master=self.chart_host)
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from viz import FrequencyChart
+
+        chart = FrequencyChart()
+        canvas = FigureCanvasTkAgg(chart.fig, master=self.chart_host)
+        chart.attach(canvas)
+        self._chart = chart
         self._canvas = canvas
         canvas.get_tk_widget().pack(fill="both", expand=True)
 
-    def update_chart(self):
+    def init_timeline_if_needed(self):
+        if self._timeline_canvas is not None:
+            return
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from viz import ShiftTimeline
+
+        timeline = ShiftTimeline()
+        canvas = FigureCanvasTkAgg(timeline.fig, master=self.chart_host)
+        timeline.attach(canvas)
+        self._timeline = timeline
+        self._timeline_canvas = canvas
+
+    def update_chart(self, result: dict):
         self.init_chart_if_needed()
-        update_frequency_axes(self._ax, self.get_input_text(), self.get_selected_text())
-        self._canvas.draw_idle()
+        chart_widget = self._canvas.get_tk_widget()
+        if self.chart_view_seg.get() != "timeline":
+            if self._timeline_canvas is not None:
+                self._timeline_canvas.get_tk_widget().pack_forget()
+                chart_widget.pack(fill="both", expand=True)
+            self._chart.update(result["input_hist"], result["selected_hist"], result["language"])
+            return
+        self.init_timeline_if_needed()
+        chart_widget.pack_forget()
+        self._timeline_canvas.get_tk_widget().pack(fill="both", expand=True)
+        self._timeline.update(result.get("profile"))
 
     def _clear_candidates(self):
-        for w in self.cand_frame.winfo_children():
-            w.destroy()
+        for row in self._cand_rows[:self._cand_visible]:
+            row[0].pack_forget()
+        self._cand_visible = 0
+        if self._cand_message is not None:
+            self._cand_message.pack_forget()
+
+    def _show_candidate_message(self, text: str):
+        if self._cand_message is None:
+            self._cand_message = ctk.CTkLabel(self.cand_frame)
+        self._cand_message.configure(text=text)
+        self._cand_message.pack(anchor="w", padx=10, pady=10)
 
     def _preview_line(self, s: str, limit: int = 140) -> str:
         t = s.replace("\n", " ").strip()
@@ -246,77 +503,79 @@ class ShiftSleuthApp(ctk.CTk):
             return t[:limit] + "..."
         return t
 
-    def build_candidates(self, text: str, matcher):
-        items = []
-        for shift in range(26):
-            plain = decrypt(text, shift)
-            if not matcher(plain):
-                continue
-            score = chi_square_score(plain)
-            items.append((shift, score, plain))
-        items.sort(key=lambda x: x[1])
-        return items
-
-    def _row_click_bind(self, widget, shift: int):
-        widget.bind("<Button-1>", lambda _e: self.apply_candidate(shift))
-
-    def update_candidates(self):
-        text = self.get_input_text()
-        if not text.strip():
-            self._clear_candidates()
-            return
+    def _row_click_bind(self, widget, index: int):
+        widget.bind("<Button-1>", lambda _e: self.apply_candidate(self._cand_shifts[index]))
 
-        self._clear_candidates()
+    def _candidate_row(self, index: int):
+        if index < len(self._cand_rows):
+            return self._cand_rows[index]
 
-        hints = parse_hints(self.crib_entry.get())
-        mode = self.andor_seg.get()
-        ignore_case = bool(self.case_switch.get())
-        use_regex = bool(self.regex_switch.get())
-        word_boundary = bool(self.boundary_switch.get())
+        row = ctk.CTkFrame(self.cand_frame, corner_radius=10)
+        info = ctk.CTkFrame(row, fg_color="transparent")
+        info.pack(side="left", fill="x", expand=True, padx=10, pady=10)
 
-        matcher, err = build_matcher(hints, mode, ignore_case, use_regex, word_boundary)
-        if err:
-            ctk.CTkLabel(self.cand_frame, text=err).pack(anchor="w", padx=10, pady=10)
-            return
+        lbl_head = ctk.CTkLabel(info, text="")
+        lbl_head.pack(anchor="w")
 
-        items = self.build_candidates(text, matcher)
-        if not items:
-            ctk.CTkLabel(self.cand_frame, text="No candidates").pack(anchor="w", padx=10, pady=10)
-            return
+        lbl_prev = ctk.CTkLabel(info, text="", text_color=("gray40", "gray70"))
+        lbl_prev.pack(anchor="w", pady=(2, 0))
 
-        shown = items[:10]
-        confs = confidence_percent([s for _, s, _ in shown])
+        btn = ctk.CTkButton(row, text="Apply", width=80, command=lambda: self.apply_candidate(self._cand_shifts[index]))
+        btn.pack(side="right", padx=10, pady=10)
 
-        current_shift = int(round(self.shift_slider.get()))
-        _, alpha_total = letter_counts_az(text)
+        for w in (row, info, lbl_head, lbl_prev):
+            self._row_click_bind(w, index)
 
-        for (shift, score, plain), conf in zip(shown, confs):
-            highlight = (shift == current_shift and self.mode_seg.get() == "decrypt")
-            row = ctk.CTkFrame(self.cand_frame, corner_radius=10, fg_color=("gray85", "gray25") if highlight else None)
-            row.pack(fill="x", padx=6, pady=6)
+        entry = (row, lbl_head, lbl_prev, row.cget("fg_color"))
+        self._cand_rows.append(entry)
+        self._cand_shifts.append(0)
+        return entry
 
-            info = ctk.CTkFrame(row, fg_color="transparent")
-            info.pack(side="left", fill="x", expand=True, padx=10, pady=10)
+    def update_candidates(self, result: dict):
+        if result["message"]:
+            self._clear_candidates()
+            self._show_candidate_message(result["message"])
+            return
+        if self._cand_message is not None:
+            self._cand_message.pack_forget()
 
-            head = f"Shift {shift} | Conf {conf:.0f}% | Score {score:.2f}"
+        mode = self.mode_seg.get()
+        current = self.key_entry.get().strip().upper() if mode == VIGENERE else int(round(self.shift_slider.get()))
+        alpha_total = result["alpha_total"]
+        candidates = result["candidates"]
+        languages = result["languages"] if self.languages() != ("en",) else [None] * len(candidates)
+
+        for i, ((shift, score, conf, plain), language) in enumerate(zip(candidates, languages)):
+            row, lbl_head, lbl_prev, default_color = self._candidate_row(i)
+            self._cand_shifts[i] = shift
+
+            highlight = (shift == current and mode in ("decrypt", VIGENERE))
+            row.configure(fg_color=("gray85", "gray25") if highlight else default_color)
+
+            label = f"Key {shift}" if isinstance(shift, str) else f"Shift {shift}"
+            if language:
+                label += f" ({language})"
+            head = f"{label} | Conf {conf:.0f}% | Score {score:.2f}"
             if alpha_total < 20:
                 head += " | Low text"
 
-            lbl_head = ctk.CTkLabel(info, text=head)
-            lbl_head.pack(anchor="w")
+            lbl_head.configure(text=head)
+            lbl_prev.configure(text=self._preview_line(plain))
 
-            lbl_prev = ctk.CTkLabel(info, text=self._preview_line(plain), text_color=("gray40", "gray70"))
-            lbl_prev.pack(anchor="w", pady=(2, 0))
+            if i >= self._cand_visible:
+                row.pack(fill="x", padx=6, pady=6)
 
-            btn = ctk.CTkButton(row, text="Apply", width=80, command=lambda s=shift: self.apply_candidate(s))
-            btn.pack(side="right", padx=10, pady=10)
+        for row in self._cand_rows[len(candidates):self._cand_visible]:
+            row[0].pack_forget()
+        self._cand_visible = len(candidates)
 
-            self._row_click_bind(row, shift)
-            self._row_click_bind(info, shift)
-            self._row_click_bind(lbl_head, shift)
-            self._row_click_bind(lbl_prev, shift)
-
-    def apply_candidate(self, shift: int):
+    def apply_candidate(self, shift: int | str):
+        if isinstance(shift, str):
+            self.mode_seg.set(VIGENERE)
+            self.key_entry.delete(0, "end")
+            self.key_entry.insert(0, shift)
+            self.update_all()
+            return
         self.mode_seg.set("decrypt")
         self.shift_slider.set(shift)
         self.shift_value.configure(text=str(shift))
@@ -327,47 +586,60 @@ class ShiftSleuthApp(ctk.CTk):
         if not text.strip():
             return
 
-        hints = parse_hints(self.crib_entry.get())
-        mode = self.andor_seg.get()
-        ignore_case = bool(self.case_switch.get())
-        use_regex = bool(self.regex_switch.get())
-        word_boundary = bool(self.boundary_switch.get())
-
-        matcher, err = build_matcher(hints, mode, ignore_case, use_regex, word_boundary)
-        if err:
-            return
-
-        items = self.build_candidates(text, matcher)
-        if not items:
+        self.run_in_background(
+            self._top_k,
+            self._apply_recommendation,
+            text,
+            self.format_seg.get(),
+            self.crib_settings(),
+            k=1,
+            alphabet=self.alphabet(),
+            scorer=self.scorer_seg.get(),
+            languages=self.languages(),
+        )
+
+    def _apply_recommendation(self, result):
+        items, err = result
+        if err or not items:
             return
-
-        best_shift, _, _ = items[0]
+        best_shift, _ = items[0]
         self.apply_candidate(best_shift)
 
-    def _clear_mapping(self):
-        for w in self.map_frame.winfo_children():
-            w.destroy()
-
-    def _map_pair(self, i: int, shift: int, map_mode: str):
-        if map_mode == "decrypt map":
-            fu = chr(65 + i)
-            tu = chr(65 + ((i - shift) % 26))
-            fl = chr(97 + i)
-            tl = chr(97 + ((i - shift) % 26))
-        else:
-            fu = chr(65 + i)
-            tu = chr(65 + ((i + shift) % 26))
-            fl = chr(97 + i)
-            tl = chr(97 + ((i + shift) % 26))
+    def _build_mapping_header(self):
+        header = ctk.CTkFrame(self.map_frame, corner_radius=10)
+        header.pack(fill="x", padx=6, pady=(6, 8))
+        self._map_header = ctk.CTkLabel(header, text="")
+        self._map_header.pack(anchor="w", padx=10, pady=10)
+
+    def _mapping_row(self, index: int):
+        if index < len(self._map_rows):
+            return self._map_rows[index]
+
+        row = ctk.CTkFrame(self.map_frame, corner_radius=10)
+        upper = ctk.CTkLabel(row, text="", width=90)
+        upper.pack(side="left", padx=(10, 6), pady=10)
+        lower = ctk.CTkLabel(row, text="", text_color=("gray40", "gray70"))
+        lower.pack(side="left", padx=6, pady=10)
+        entry = (row, upper, lower)
+        self._map_rows.append(entry)
+        return entry
+
+    def _map_pair(self, i: int, shift: int, map_mode: str, alphabet=None):
+        segments = (alphabet or self.alphabet()).segments
+        n = len(segments[0])
+        j = (i - shift) % n if map_mode == "decrypt map" else (i + shift) % n
+        fu, tu = segments[0][i], segments[0][j]
+        fl, tl = (segments[1][i], segments[1][j]) if len(segments) > 1 else ("", "")
         return fu, tu, fl, tl
 
     def mapping_text(self) -> str:
         shift = int(round(self.shift_slider.get()))
         mode = self.map_mode_seg.get()
-        lines = [f"{mode} | shift {shift}"]
-        for i in range(26):
-            fu, tu, fl, tl = self._map_pair(i, shift, mode)
-            lines.append(f"{fu}->{tu}  {fl}->{tl}")
+        alphabet = self.alphabet()
+        lines = [f"{mode} | {alphabet.name} | shift {shift}"]
+        for i in range(alphabet.size):
+            fu, tu, fl, tl = self._map_pair(i, shift, mode, alphabet)
+            lines.append(f"{fu}->{tu}  {fl}->{tl}" if fl else f"{fu}->{tu}")
         return "\n".join(lines)
 
     def copy_mapping(self):
@@ -378,35 +650,86 @@ class ShiftSleuthApp(ctk.CTk):
     def update_mapping(self):
         shift = int(round(self.shift_slider.get()))
         map_mode = self.map_mode_seg.get()
+        alphabet = self.alphabet()
 
-        self._clear_mapping()
-
-        header = ctk.CTkFrame(self.map_frame, corner_radius=10)
-        header.pack(fill="x", padx=6, pady=(6, 8))
-        ctk.CTkLabel(header, text=f"{map_mode} | shift {shift}").pack(anchor="w", padx=10, pady=10)
-
-        for i in range(26):
-            fu, tu, fl, tl = self._map_pair(i, shift, map_mode)
-
-            row = ctk.CTkFrame(self.map_frame, corner_radius=10)
-            row.pack(fill="x", padx=6, pady=4)
-
-            ctk.CTkLabel(row, text=f"{fu} → {tu}", width=90).pack(side="left", padx=(10, 6), pady=10)
-            ctk.CTkLabel(row, text=f"{fl} → {tl}", text_color=("gray40", "gray70")).pack(side="left", padx=6, pady=10)
+        if (shift, map_mode, alphabet.name) == self._map_key:
+            return
+        self._map_key = (shift, map_mode, alphabet.name)
+
+        if self._map_header is None:
+            self._build_mapping_header()
+
+        self._map_header.configure(text=f"{map_mode} | {alphabet.name} | shift {shift}")
+        for i in range(alphabet.size):
+            row, upper, lower = self._mapping_row(i)
+            fu, tu, fl, tl = self._map_pair(i, shift, map_mode, alphabet)
+            upper.configure(text=f"{fu} → {tu}")
+            lower.configure(text=f"{fl} → {tl}" if fl else "")
+            if i >= self._map_visible:
+                row.pack(fill="x", padx=6, pady=4)
+        for row, _, _ in self._map_rows[alphabet.size:self._map_visible]:
+            row.pack_forget()
+        self._map_visible = alphabet.size
 
     def copy_output(self):
-        out = self.output_box.get("1.0", "end-1c")
-        if not out.strip():
+        out = self._output_text
+        if not out or out.isspace():
             return
         self.clipboard_clear()
-        self.clipboard_append(out)
+        for start in range(0, len(out), _CLIPBOARD_CHUNK):
+            self.clipboard_append(out[start:start + _CLIPBOARD_CHUNK])
 
     def clear_all(self):
+        if self._large_text is not None:
+            self._large_text = None
+            self.input_info.configure(text="")
+            self.input_box.configure(state="normal")
         self.input_box.delete("1.0", "end")
         self.set_output_text("")
         self._clear_candidates()
-        self.update_chart()
-        self.update_mapping()
+        self.update_all()
+
+    def toggle_perf_overlay(self, _event=None):
+        if self._perf_overlay is None:
+            self._perf_overlay = ctk.CTkFrame(self, corner_radius=8)
+            self._perf_label = ctk.CTkLabel(
+                self._perf_overlay, text="", justify="left", font=ctk.CTkFont(family="Courier", size=11)
+            )
+            self._perf_label.pack(anchor="w", padx=10, pady=(8, 4))
+            ctk.CTkButton(self._perf_overlay, text="Export trace", width=110, command=self.export_trace).pack(
+                anchor="e", padx=10, pady=(0, 8)
+            )
+
+        self._perf_visible = not self._perf_visible
+        if self._perf_visible:
+            perf.enable(True)
+            self._perf_overlay.place(relx=1.0, rely=1.0, anchor="se", x=-18, y=-18)
+            self._refresh_perf_overlay()
+        else:
+            perf.enable(perf.instrumented())
+            self._perf_overlay.place_forget()
+
+    def _refresh_perf_overlay(self):
+        if not self._perf_visible:
+            return
+        text = perf.format_stats()
+        if not perf.instrumented():
+            text += f"\n(start with {perf.PERF_ENV}=1 to time cipher/scoring/crib calls)"
+        self._perf_label.configure(text=text)
+        self.after(500, self._refresh_perf_overlay)
+
+    def export_trace(self):
+        from tkinter import filedialog
+
+        path = filedialog.asksaveasfilename(
+            parent=self, defaultextension=".json", initialfile="shiftsleuth-trace.json", title="Export trace"
+        )
+        if path:
+            perf.export_chrome_trace(path)
+
+    def destroy(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        super().destroy()
 
 
 def main():
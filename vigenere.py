@@ -0,0 +1,201 @@
+from __future__ import annotations
+
+import re
+from itertools import repeat
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from cipher import LATIN, _byte_view
+from ngrams import _NON_LETTERS, letter_values, quadgram_score
+from perf import timed
+from scoring import ENGLISH_FREQ, _NUMPY_MIN_LEN, _VALUE_BYTES, chi_square_scores
+
+
+ENGLISH_IC = sum(f * f for f in ENGLISH_FREQ)
+RANDOM_IC = 1 / 26
+
+_MIN_COLUMN = 8
+_KASISKI_LETTERS = 1 << 14
+# Periods and keys are found on this many letters; even at period 20 each
+# column still gets thousands of letters.
+_CRACK_LETTERS = 1 << 18
+_RANK_CHARS = 1 << 15
+_LETTER_RUN = re.compile(rb"[A-Za-z]+")
+if np is not None:
+    _IS_LETTER_NP = np.zeros(256, dtype=bool)
+    _IS_LETTER_NP[65:91] = _IS_LETTER_NP[97:123] = True
+
+
+def key_shifts(key: str) -> list[int]:
+    key = key.strip()
+    if not key or not key.isascii() or not key.isalpha():
+        raise ValueError("key must be one or more letters A-Z")
+    return [ord(ch) - 65 for ch in key.upper()]
+
+
+def key_text(shifts: list[int]) -> str:
+    return "".join(chr(65 + s % 26) for s in shifts)
+
+
+def _splice_letters(data: bytes, letters: bytearray) -> bytes:
+    if np is not None and len(data) >= _NUMPY_MIN_LEN:
+        out = np.frombuffer(data, dtype=np.uint8).copy()
+        out[_IS_LETTER_NP[out]] = np.frombuffer(letters, dtype=np.uint8)
+        return out.tobytes()
+
+    pos = 0
+
+    def take(m: re.Match) -> bytes:
+        nonlocal pos
+        run = letters[pos:pos + len(m[0])]
+        pos += len(m[0])
+        return bytes(run)
+
+    return _LETTER_RUN.sub(take, data)
+
+
+def vigenere(text: str | bytes, key: str, *, decrypt: bool = False) -> str | bytes:
+    if not isinstance(text, (str, bytes, bytearray)):
+        # The output is a fresh buffer anyway, so other buffers are read once.
+        try:
+            text = _byte_view(text, "text").tobytes()
+        except TypeError:
+            raise TypeError("text must be a string or bytes-like object") from None
+    shifts = key_shifts(key)
+    data = text.encode("utf-8", "surrogatepass") if isinstance(text, str) else bytes(text)
+
+    letters = bytearray(data.translate(None, _NON_LETTERS))
+    period = len(shifts)
+    for c, s in enumerate(shifts):
+        letters[c::period] = letters[c::period].translate(LATIN.table(-s if decrypt else s))
+
+    out = _splice_letters(data, letters)
+    return out.decode("utf-8", "surrogatepass") if isinstance(text, str) else out
+
+
+def index_of_coincidence(counts: list[int], total: int) -> float:
+    if total < 2:
+        return 0.0
+    return sum(c * (c - 1) for c in counts) / (total * (total - 1))
+
+
+def _column_histograms_numpy(values: bytes, period: int) -> list[list[int]]:
+    v = np.frombuffer(values, dtype=np.uint8)
+    slots = np.arange(len(v), dtype=np.intp) % period * 26 + v
+    return np.bincount(slots, minlength=period * 26).reshape(period, 26).tolist()
+
+
+def column_histograms(values: bytes, period: int) -> list[list[int]]:
+    if np is not None and len(values) >= _NUMPY_MIN_LEN:
+        return _column_histograms_numpy(values, period)
+    columns = [values[c::period] for c in range(period)]
+    return [[col.count(b) for b in _VALUE_BYTES] for col in columns]
+
+
+def kasiski(values: bytes, max_period: int) -> list[int]:
+    votes = [0] * (max_period + 1)
+    last: dict[bytes, int] = {}
+    prefix = values[:_KASISKI_LETTERS]
+    for i in range(len(prefix) - 2):
+        gram = prefix[i:i + 3]
+        j = last.get(gram)
+        last[gram] = i
+        if j is None:
+            continue
+        distance = i - j
+        for p in range(2, max_period + 1):
+            if distance % p == 0:
+                votes[p] += 1
+    return votes
+
+
+def _evaluate_period(values: bytes, period: int) -> tuple[int, float, list[int], list[list[int]]]:
+    columns = column_histograms(values, period)
+    ic = sum(index_of_coincidence(col, sum(col)) for col in columns) / period
+    key = []
+    for col in columns:
+        scores = chi_square_scores(col, sum(col))
+        key.append(min(range(26), key=scores.__getitem__))
+    return period, ic, key, columns
+
+
+def evaluate_periods(values: bytes, periods: list[int]) -> list[tuple[int, float, list[int], list[list[int]]]]:
+    return list(map(_evaluate_period, repeat(values), periods))
+
+
+def _minimal_key(key: list[int]) -> list[int]:
+    n = len(key)
+    for p in range(1, n):
+        if n % p == 0 and key == key[:p] * (n // p):
+            return key[:p]
+    return key
+
+
+def _plaintext_chi_square(columns: list[list[int]], key: list[int]) -> float:
+    counts = [0] * 26
+    for col, s in zip(columns, key):
+        for i in range(26):
+            counts[i] += col[(i + s) % 26]
+    return chi_square_scores(counts, sum(counts))[0]
+
+
+@timed("vigenere.crack")
+def crack(
+    text: str | bytes,
+    max_period: int = 20,
+    top: int = 3,
+) -> list[tuple[str, float]]:
+    values = letter_values(text)
+    total = len(values)
+    values = values[:_CRACK_LETTERS]
+    max_period = min(max_period, len(values) // _MIN_COLUMN)
+    if max_period < 2:
+        return []
+
+    results = evaluate_periods(values, list(range(1, max_period + 1)))
+    caesar, periodic = results[0], results[1:]
+    best_ic = max(ic for _, ic, _, _ in periodic)
+    cutoff = RANDOM_IC + 0.75 * (best_ic - RANDOM_IC)
+    chosen = [r for r in periodic if r[1] >= cutoff][:top]
+
+    votes = kasiski(values, max_period)
+    kasiski_period = max(range(2, max_period + 1), key=votes.__getitem__)
+    if votes[kasiski_period] and all(r[0] != kasiski_period for r in chosen):
+        chosen.append(results[kasiski_period - 1])
+
+    # Chi-square grows with the letter count, so a score from the prefix is
+    # scaled up to stay comparable with shift scores over the whole text.
+    scale = total / len(values)
+    found: dict[str, float] = {}
+    for _, _, key, columns in chosen:
+        minimal = _minimal_key(key)
+        if len(minimal) > 1:
+            found.setdefault(key_text(minimal), _plaintext_chi_square(columns, key) * scale)
+    if not found:
+        return []
+
+    # Longer periods always fit the column histograms at least as well, so the
+    # chi-square alone favours over-long keys; quadgrams catch the wrong columns.
+    # Keys that read worse than the best plain shift are dropped.
+    sample = text[:_RANK_CHARS]
+    plausibility = {key: quadgram_score(vigenere(sample, key, decrypt=True)) for key in found}
+    baseline = quadgram_score(vigenere(sample, key_text(caesar[2]), decrypt=True))
+    ranked = sorted(found.items(), key=lambda x: plausibility[x[0]])
+    return [(key, score) for key, score in ranked if plausibility[key] < baseline]
+
+
+__all__ = [
+    "ENGLISH_IC",
+    "RANDOM_IC",
+    "vigenere",
+    "key_shifts",
+    "key_text",
+    "index_of_coincidence",
+    "column_histograms",
+    "kasiski",
+    "evaluate_periods",
+    "crack",
+]
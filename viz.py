@@ -1,39 +1,128 @@
 from __future__ import annotations
 
+import math
+
 from matplotlib.figure import Figure
 
-from scoring import ENGLISH_FREQ, letter_counts_az
+from scoring import LANGUAGES
 
 
-def _freqs(text: str) -> tuple[list[float], int]:
-    counts, total = letter_counts_az(text)
+def counts_to_freqs(counts: list[int], total: int) -> list[float]:
     if total <= 0:
-        return [0.0] * 26, 0
-    return [c / total for c in counts], total
+        return [0.0] * 26
+    return [c / total for c in counts]
+
+
+class FrequencyChart:
+    def __init__(self):
+        self.fig = Figure(figsize=(6.2, 2.6), dpi=100)
+        self.ax = self.fig.add_subplot(111)
+        self.canvas = None
+        self._background = None
+
+        x = list(range(26))
+        zeros = [0.0] * 26
+        (self._line_input,) = self.ax.plot(x, zeros, label="Input", animated=True)
+        (self._line_selected,) = self.ax.plot(x, zeros, label="Selected", animated=True)
+        self._language = LANGUAGES["en"]
+        (self._line_expected,) = self.ax.plot(x, self._language.freq, label=self._language.name)
+
+        self._ymax = self._ylim_for([])
+        self.ax.set_ylim(0, self._ymax)
+        self.ax.set_xticks(x)
+        self.ax.set_xticklabels([chr(65 + i) for i in range(26)], fontsize=8)
+        self.ax.legend(loc="upper right", fontsize=8)
+        self.ax.grid(True, alpha=0.2)
+        self.fig.tight_layout()
+
+    def attach(self, canvas) -> None:
+        self.canvas = canvas
+        canvas.mpl_connect("draw_event", self._on_draw)
+
+    def _ylim_for(self, values: list[float]) -> float:
+        return max(0.13, math.ceil(max([*values, *self._language.freq]) * 1.1 * 20) / 20)
+
+    def _on_draw(self, _event) -> None:
+        self._background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_animated()
+
+    def _draw_animated(self) -> None:
+        self.ax.draw_artist(self._line_input)
+        self.ax.draw_artist(self._line_selected)
+
+    def update(
+        self,
+        input_hist: tuple[list[int], int],
+        selected_hist: tuple[list[int], int],
+        language: str = "en",
+    ) -> None:
+        fin = counts_to_freqs(*input_hist)
+        fsel = counts_to_freqs(*selected_hist)
+        self._line_input.set_ydata(fin)
+        self._line_selected.set_ydata(fsel)
+
+        # The reference line is part of the cached background, so switching
+        # language needs a full redraw.
+        relabel = language != self._language.code
+        if relabel:
+            self._language = LANGUAGES[language]
+            self._line_expected.set_ydata(self._language.freq)
+            self._line_expected.set_label(self._language.name)
+            self.ax.legend(loc="upper right", fontsize=8)
+
+        if self.canvas is None:
+            return
+
+        ymax = self._ylim_for(fin + fsel)
+        if self._background is None or ymax != self._ymax or relabel:
+            self._ymax = ymax
+            self.ax.set_ylim(0, ymax)
+            self.canvas.draw_idle()
+            return
+
+        self.canvas.restore_region(self._background)
+        self._draw_animated()
+        self.canvas.blit(self.ax.bbox)
 
 
-def build_frequency_figure(input_text: str, selected_text: str) -> tuple[Figure, object]:
-    fig = Figure(figsize=(6.2, 2.6), dpi=100)
-    ax = fig.add_subplot(111)
-    update_frequency_axes(ax, input_text, selected_text)
-    fig.tight_layout()
-    return fig, ax
+class ShiftTimeline:
+    def __init__(self):
+        self.fig = Figure(figsize=(6.2, 2.6), dpi=100)
+        self.ax = self.fig.add_subplot(111)
+        self.canvas = None
+        self._marks = []
 
+        (self._line,) = self.ax.plot([], [], drawstyle="steps-mid", linewidth=1.2, label="Best shift per window")
+        self.ax.set_ylim(-0.5, 25.5)
+        self.ax.set_yticks(range(0, 26, 5))
+        self.ax.set_xlabel("offset", fontsize=8)
+        self.ax.set_ylabel("shift", fontsize=8)
+        self.ax.tick_params(labelsize=8)
+        self.ax.legend(loc="upper right", fontsize=8)
+        self.ax.grid(True, alpha=0.2)
+        self.fig.tight_layout()
 
-def update_frequency_axes(ax, input_text: str, selected_text: str) -> None:
-    fin, _ = _freqs(input_text)
-    fsel, _ = _freqs(selected_text)
-    fref = ENGLISH_FREQ
+    def attach(self, canvas) -> None:
+        self.canvas = canvas
 
-    ax.clear()
+    def update(self, profile) -> None:
+        for mark in self._marks:
+            mark.remove()
+        self._marks = []
 
-    x = list(range(26))
-    ax.plot(x, fin, label="Input")
-    ax.plot(x, fsel, label="Selected")
-    ax.plot(x, fref, label="English")
+        if profile is None or not profile.shifts:
+            self._line.set_data([], [])
+            self.ax.set_xlim(0, 1)
+        else:
+            self._line.set_data(profile.offsets, profile.shifts)
+            end = profile.segments[-1].end
+            self.ax.set_xlim(0, max(end, 1))
+            for i, seg in enumerate(profile.segments):
+                if i % 2:
+                    self._marks.append(self.ax.axvspan(seg.start, seg.end, color="gray", alpha=0.12, lw=0))
+                self._marks.append(
+                    self.ax.text((seg.start + seg.end) / 2, 24, str(seg.shift), ha="center", va="top", fontsize=8)
+                )
 
-    ax.set_ylim(0, max(0.13, max(fin + fsel + fref) * 1.1))
-    ax.set_xticks(x)
-    ax.set_xticklabels([chr(65 + i) for i in range(26)], fontsize=8)
-    ax.legend(loc="upper right", fontsize=8)
-    ax.grid(True, alpha=0.2)
+        if self.canvas is not None:
+            self.canvas.draw_idle()